@@ -1,7 +1,45 @@
-import subprocess
+import io
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import excelExport
+import reportTables
+from incrementalRollup import load_incremental_aggregates
+from analysis import product_demand_report
+from analysisWithRegion import region_demand_report
 
-# Call analysis.py
-subprocess.run(["python", "analysis.py"])
+# Nightly run of the product and region demand reports.
+# Both reports are stages over one loaded and aggregated data set, run in this process
+# (concurrently, on threads) instead of one Python process per script that reloads and
+# re-aggregates createdData.csv. The printed output of each stage is collected and printed
+# in stage order once all stages have finished.
+# While the report threads are alive, the process pools inside the stages (clustering, region
+# shards, chart rendering) run their work in the calling thread instead of forking, so the
+# reports overlap with each other rather than within themselves.
+SALES_DATA_FILE = 'deveopedData/createdData.csv'
+REPORT_STAGES = [product_demand_report, region_demand_report]
 
-# Call analysisWithRegion.py
-subprocess.run(["python", "analysisWithRegion.py"])
+
+def run_reports(file_path=SALES_DATA_FILE, stages=REPORT_STAGES, excel_folder='demanded_products', max_workers=None):
+    sales_aggregates = load_incremental_aggregates(file_path)
+
+    logs = [io.StringIO() for stage in stages]
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages)) as executor:
+        futures = [executor.submit(stage, sales_aggregates, excel_folder, log) for stage, log in zip(stages, logs)]
+        excel_filenames = [future.result() for future in futures]
+
+    for log in logs:
+        print(log.getvalue(), end='')
+    return excel_filenames
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the product and region demand reports')
+    parser.add_argument('--native-charts', action='store_true', help='native Excel charts instead of chart images')
+    parser.add_argument('--report-tables', choices=['parquet', 'arrow'],
+                        help='also write the report tables, partitioned by run date')
+    arguments = parser.parse_args()
+    if arguments.native_charts:
+        excelExport.CHART_MODE = excelExport.CHART_MODE_NATIVE
+    if arguments.report_tables:
+        reportTables.REPORT_TABLE_FORMAT = arguments.report_tables
+    run_reports()
@@ -0,0 +1,96 @@
+import io
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+# Off-screen chart rendering.
+# Charts are drawn with the Agg canvas directly (no pyplot state), each worker keeps one
+# figure/axes per chart kind and clears it between charts, and every chart is returned as
+# PNG bytes instead of being written to disk. Large batches are spread over a forked process
+# pool, unless other threads are alive (a fork taken while another thread holds a lock can
+# deadlock the child).
+PARALLEL_MIN_CHARTS = 32
+CHART_CHUNK_SIZE = 16
+
+# Figures of the current thread (threads rendering at the same time never share an axes)
+worker_figures = threading.local()
+
+
+def line_chart(title, x_values, y_values, xlabel='Date', ylabel='Quantity Sold'):
+    return {'kind': 'line', 'title': title, 'x': list(x_values), 'y': list(y_values),
+            'xlabel': xlabel, 'ylabel': ylabel}
+
+
+def multi_line_chart(title, x_values, series, xlabel, ylabel):
+    # series maps each legend label to its y values
+    return {'kind': 'multi_line', 'title': title, 'x': list(x_values),
+            'series': {label: list(y_values) for label, y_values in series.items()},
+            'xlabel': xlabel, 'ylabel': ylabel}
+
+
+def pie_chart(title, values, labels, labeldistance=1.1):
+    return {'kind': 'pie', 'title': title, 'values': list(values), 'labels': list(labels),
+            'labeldistance': labeldistance}
+
+
+def bar_chart(title, labels, values, xlabel='Product Name', ylabel='Quantity Demanded', color=None):
+    return {'kind': 'bar', 'title': title, 'labels': list(labels), 'values': list(values),
+            'xlabel': xlabel, 'ylabel': ylabel, 'color': color}
+
+
+def figure_for(kind):
+    figures = worker_figures.__dict__
+    if kind not in figures:
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        figures[kind] = (figure, figure.add_subplot())
+    return figures[kind]
+
+
+def render_chart(chart):
+    figure, axes = figure_for(chart['kind'])
+    axes.clear()
+
+    if chart['kind'] == 'line':
+        axes.plot(chart['x'], chart['y'], marker='o')
+        axes.set_xlabel(chart['xlabel'])
+        axes.set_ylabel(chart['ylabel'])
+        axes.tick_params(axis='x', labelrotation=45)
+    elif chart['kind'] == 'multi_line':
+        for label, y_values in chart['series'].items():
+            axes.plot(chart['x'], y_values, label=label, marker='o')
+        axes.set_xlabel(chart['xlabel'])
+        axes.set_ylabel(chart['ylabel'])
+        axes.legend()
+    elif chart['kind'] == 'pie':
+        axes.pie(chart['values'], labels=chart['labels'], autopct='%1.1f%%', labeldistance=chart['labeldistance'])
+    elif chart['kind'] == 'bar':
+        axes.bar(chart['labels'], chart['values'], color=chart['color'])
+        axes.set_xlabel(chart['xlabel'])
+        axes.set_ylabel(chart['ylabel'])
+        axes.tick_params(axis='x', labelrotation=45)
+    else:
+        raise ValueError(f"Unknown chart kind: {chart['kind']}")
+    axes.set_title(chart['title'])
+
+    image_buffer = io.BytesIO()
+    figure.savefig(image_buffer, format='png')
+    return image_buffer.getvalue()
+
+
+def render_charts(charts, max_workers=None):
+    charts = list(charts)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    # The analysis scripts run at module level, so workers must be forked rather than spawned
+    if len(charts) < PARALLEL_MIN_CHARTS or max_workers <= 1 or threading.active_count() > 1 \
+            or 'fork' not in multiprocessing.get_all_start_methods():
+        return [render_chart(chart) for chart in charts]
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('fork')) as executor:
+        return list(executor.map(render_chart, charts, chunksize=CHART_CHUNK_SIZE))
@@ -0,0 +1,169 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from sklearn.base import clone
+from sklearn.cluster import KMeans, MiniBatchKMeans, DBSCAN, AgglomerativeClustering, Birch
+from sklearn.neighbors import NearestNeighbors
+
+
+# Runs the configured clustering algorithms concurrently on one feature matrix.
+# The matrix is placed in shared memory once; every worker process maps it instead of
+# receiving a pickled copy. Each task fits one algorithm on one row range (the whole matrix,
+# or a single region when the rows are sorted by region), and returns labels and fit time.
+# The tasks run in-process when other threads are alive (forking next to them is unsafe).
+PARALLEL_MIN_ROWS = 5000
+
+# Large-catalog mode.
+# From LARGE_CATALOG_ROWS rows on, algorithms that do not scale to large catalogs are
+# swapped for scalable equivalents that still return one label per row:
+#   KMeans                  -> MiniBatchKMeans
+#   AgglomerativeClustering -> Birch pre-clustering, agglomerative on the subcluster centroids
+#   Birch                   -> Birch with a threshold that bounds the number of subclusters
+#   DBSCAN                  -> DBSCAN on a sparse radius-neighbors graph from a KD-tree
+LARGE_CATALOG_ROWS = 50000
+BIRCH_CELLS_PER_AXIS = 64
+
+
+class ClusteringResult:
+    def __init__(self, index, name, group, labels, fit_seconds):
+        self.index = index
+        self.name = name
+        self.group = group
+        self.labels = labels
+        self.fit_seconds = fit_seconds
+
+
+class RadiusGraphDBSCAN:
+    def __init__(self, eps=0.5, min_samples=5, n_jobs=None):
+        self.eps = eps
+        self.min_samples = min_samples
+        self.n_jobs = n_jobs
+
+    def fit(self, features):
+        # Only pairs closer than eps are stored, so memory follows the neighborhood sizes
+        neighbors = NearestNeighbors(radius=self.eps, algorithm='kd_tree', n_jobs=self.n_jobs).fit(features)
+        neighbor_graph = neighbors.radius_neighbors_graph(features, mode='distance', sort_results=True)
+        self.labels_ = DBSCAN(eps=self.eps, min_samples=self.min_samples, metric='precomputed').fit(neighbor_graph).labels_
+        return self
+
+
+def birch_threshold(features):
+    spread = np.linalg.norm(features.max(axis=0) - features.min(axis=0)) if len(features) else 0.0
+    return spread / BIRCH_CELLS_PER_AXIS if spread > 0 else 0.5
+
+
+def scalable_algorithm(algorithm, features):
+    if isinstance(algorithm, MiniBatchKMeans):
+        return algorithm
+    if isinstance(algorithm, KMeans):
+        return MiniBatchKMeans(n_clusters=algorithm.n_clusters, random_state=algorithm.random_state,
+                               batch_size=4096, n_init=3)
+    if isinstance(algorithm, AgglomerativeClustering):
+        return Birch(threshold=birch_threshold(features), n_clusters=clone(algorithm))
+    if isinstance(algorithm, Birch):
+        threshold = max(algorithm.threshold, birch_threshold(features))
+        return clone(algorithm).set_params(threshold=threshold)
+    if isinstance(algorithm, DBSCAN):
+        return RadiusGraphDBSCAN(eps=algorithm.eps, min_samples=algorithm.min_samples)
+    return algorithm
+
+
+def fit_labels(algorithm, features):
+    start_time = time.perf_counter()
+    algorithm.fit(features)
+    labels = getattr(algorithm, 'labels_', None)
+    if labels is None:
+        # For Gaussian Mixture, the cluster is the component with the highest probability
+        labels = algorithm.predict_proba(features).argmax(axis=1)
+    return np.asarray(labels), time.perf_counter() - start_time
+
+
+def fit_shared_task(shared_name, shape, dtype, start, end, algorithm):
+    shared_features = shared_memory.SharedMemory(name=shared_name)
+    try:
+        features = np.ndarray(shape, dtype=dtype, buffer=shared_features.buf)[start:end]
+        labels, fit_seconds = fit_labels(algorithm, features)
+        del features
+    finally:
+        shared_features.close()
+    return labels, fit_seconds
+
+
+def parallel_context():
+    # The analysis scripts run at module level, so workers must be forked rather than spawned;
+    # forking is only safe while this is the only thread of the process
+    if threading.active_count() > 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context('fork')
+
+
+def run_clustering(features, algorithms, algorithm_names=None, groups=None, max_workers=None,
+                   large_catalog_rows=LARGE_CATALOG_ROWS):
+    features = np.ascontiguousarray(features, dtype='float64')
+    if algorithm_names is None:
+        algorithm_names = {index: algorithm.__class__.__name__ for index, algorithm in enumerate(algorithms)}
+    if groups is None:
+        groups = [(None, 0, len(features))]
+
+    # Names and sheet indexes stay those of the configured algorithms in large-catalog mode
+    tasks = []
+    for group, start, end in groups:
+        for index, algorithm in enumerate(algorithms):
+            if large_catalog_rows is not None and end - start >= large_catalog_rows:
+                algorithm = scalable_algorithm(algorithm, features[start:end])
+            tasks.append((index, algorithm, group, start, end))
+    if max_workers is None:
+        max_workers = min(len(tasks), os.cpu_count() or 1)
+
+    context = parallel_context()
+    if context is None or max_workers <= 1 or len(features) < PARALLEL_MIN_ROWS:
+        results = []
+        for index, algorithm, group, start, end in tasks:
+            labels, fit_seconds = fit_labels(algorithm, features[start:end])
+            results.append(ClusteringResult(index, algorithm_names[index], group, labels, fit_seconds))
+        return results
+
+    shared_features = shared_memory.SharedMemory(create=True, size=max(features.nbytes, 1))
+    try:
+        np.ndarray(features.shape, dtype=features.dtype, buffer=shared_features.buf)[:] = features
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            futures = [executor.submit(fit_shared_task, shared_features.name, features.shape, features.dtype,
+                                       start, end, algorithm)
+                       for index, algorithm, group, start, end in tasks]
+            results = []
+            for (index, algorithm, group, start, end), future in zip(tasks, futures):
+                labels, fit_seconds = future.result()
+                results.append(ClusteringResult(index, algorithm_names[index], group, labels, fit_seconds))
+    finally:
+        shared_features.close()
+        shared_features.unlink()
+    return results
+
+
+def group_ranges(group_values):
+    # (group, start, end) row ranges for a column that is already sorted by group
+    group_values = np.asarray(group_values)
+    if len(group_values) == 0:
+        return []
+    boundaries = np.flatnonzero(group_values[1:] != group_values[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(group_values)]))
+    return [(group_values[start], start, end) for start, end in zip(starts, ends)]
+
+
+def merge_group_results(results):
+    # One result per algorithm, with the labels of its groups in row order and the summed fit time;
+    # the groups come from group_ranges, so they cover the rows one after the other
+    merged = {}
+    for result in results:
+        if result.index not in merged:
+            merged[result.index] = ClusteringResult(result.index, result.name, None, [], 0.0)
+        merged[result.index].labels.append(result.labels)
+        merged[result.index].fit_seconds += result.fit_seconds
+    for result in merged.values():
+        result.labels = np.concatenate(result.labels)
+    return [merged[index] for index in sorted(merged)]
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+
+# Date parsing with known formats and a per-call dictionary of unique date strings.
+# Sales and order files repeat a small set of date strings across many rows, so each distinct
+# string is parsed once (with an explicit format, no per-value format inference) and the
+# parsed values are spread back to the rows through the factorized codes.
+SALES_DATE_FORMAT = '%Y-%m-%d'
+ORDER_DATE_FORMAT = '%m/%d/%y %H:%M'
+KNOWN_DATE_FORMATS = [SALES_DATE_FORMAT, ORDER_DATE_FORMAT, '%Y-%m-%d %H:%M:%S', '%m/%d/%Y']
+
+
+def parse_unique_dates(unique_values, formats, errors, infer_unknown):
+    parsed = pd.Series(pd.NaT, index=range(len(unique_values)), dtype='datetime64[us]')
+    unparsed = np.ones(len(unique_values), dtype=bool)
+    for date_format in formats:
+        if not unparsed.any():
+            break
+        parsed_with_format = pd.to_datetime(unique_values[unparsed], format=date_format, errors='coerce')
+        parsed.iloc[np.flatnonzero(unparsed)] = parsed_with_format
+        unparsed[unparsed] = pd.isna(parsed_with_format)
+
+    if unparsed.any():
+        if infer_unknown:
+            # Strings in none of the known formats fall back to pandas' format inference
+            parsed.iloc[np.flatnonzero(unparsed)] = pd.to_datetime(unique_values[unparsed], errors=errors)
+        elif errors == 'raise':
+            raise ValueError(f"Dates not in the formats {formats}: {list(unique_values[unparsed][:5])}")
+    return parsed.to_numpy()
+
+
+def parse_dates(values, formats=None, errors='raise'):
+    # values is a Series (or array) of date strings; returns a datetime64 Series.
+    # Without explicit formats the known formats are tried first and anything else is inferred;
+    # with explicit formats, other strings are errors (or NaT with errors='coerce').
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values
+    infer_unknown = formats is None
+    if formats is None:
+        formats = KNOWN_DATE_FORMATS
+    elif isinstance(formats, str):
+        formats = [formats]
+
+    codes, unique_values = pd.factorize(values)
+    parsed_unique = parse_unique_dates(np.asarray(unique_values, dtype=object), formats, errors, infer_unknown)
+
+    # Missing values have code -1 and stay NaT
+    parsed = np.full(len(codes), np.datetime64('NaT'), dtype=parsed_unique.dtype)
+    present = codes >= 0
+    parsed[present] = parsed_unique[codes[present]]
+    return pd.Series(parsed, index=values.index, name=values.name)
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+from weekCalendar import split_week_keys, week_key_to_ordinal, ordinal_to_week_key
+
+
+# Week-over-week demand change without merges.
+# Weekly demand is laid out once as a dense (series x week) matrix, where a series is a product
+# or a (region, product) pair and the weeks are contiguous ISO weeks. A lag of L weeks is then a
+# column offset, so the change of every series for any lag (1, 4, 52, ...) is one array subtraction.
+class DemandMatrix:
+    def __init__(self, weekly_demand, series_columns):
+        self.series_columns = list(series_columns)
+        series_codes, self.series = factorize_series(weekly_demand, self.series_columns)
+
+        week_keys, week_positions = np.unique(weekly_demand['Week Key'].to_numpy(dtype='int64'), return_inverse=True)
+        week_ordinals = week_key_to_ordinal(week_keys)
+        first_ordinal = week_ordinals.min() if len(week_ordinals) else 0
+        week_count = week_ordinals.max() - first_ordinal + 1 if len(week_ordinals) else 0
+        self.week_keys = ordinal_to_week_key(np.arange(first_ordinal, first_ordinal + week_count))
+
+        # NaN marks a week in which the series has no sales row
+        self.quantities = np.full((len(self.series), week_count), np.nan)
+        self.quantities[series_codes, week_ordinals[week_positions] - first_ordinal] = weekly_demand['Quantity'].to_numpy()
+
+    def week_position(self, week_key):
+        position = np.searchsorted(self.week_keys, week_key)
+        if position >= len(self.week_keys) or self.week_keys[position] != week_key:
+            raise KeyError(f"Week {week_key} is not in the demand matrix")
+        return position
+
+    def change(self, lag=1, week_key=None):
+        current_position = len(self.week_keys) - 1 if week_key is None else self.week_position(week_key)
+        previous_position = current_position - lag
+
+        current = self.quantities[:, current_position]
+        if previous_position >= 0:
+            previous_week_key = self.week_keys[previous_position]
+            previous = self.quantities[:, previous_position]
+        else:
+            previous_week_key = ordinal_to_week_key(week_key_to_ordinal([self.week_keys[current_position]]) - lag)[0]
+            previous = np.full(len(current), np.nan)
+
+        # Only series that sold in the current week are reported, as with the old left merge
+        sold = ~np.isnan(current)
+        current = current[sold]
+        previous = previous[sold]
+        change = current - previous
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_percent = change / previous * 100
+
+        current_year, current_week = split_week_keys(self.week_keys[current_position])
+        previous_year, previous_week = split_week_keys(previous_week_key)
+        demand_change = self.series[sold].reset_index(drop=True)
+        demand_change['Year_x'] = current_year
+        demand_change['Week_x'] = current_week
+        demand_change['Quantity_x'] = as_integer_if_complete(current)
+        demand_change['Year_y'] = previous_year
+        demand_change['Week_y'] = previous_week
+        demand_change['Quantity_y'] = as_integer_if_complete(previous)
+        demand_change['Change'] = as_integer_if_complete(change)
+        demand_change['Change(%)'] = change_percent
+        return demand_change
+
+
+def factorize_series(frame, series_columns):
+    # Combine per-column codes into one code per series, keeping the lexicographic order
+    column_codes = []
+    column_labels = []
+    for column in series_columns:
+        codes, labels = pd.factorize(frame[column], sort=True)
+        column_codes.append(codes)
+        column_labels.append(labels)
+
+    combined_codes = np.ravel_multi_index(column_codes, [len(labels) for labels in column_labels])
+    unique_codes, series_codes = np.unique(combined_codes, return_inverse=True)
+    label_positions = np.unravel_index(unique_codes, [len(labels) for labels in column_labels])
+    series = pd.DataFrame({column: labels.take(positions)
+                           for column, labels, positions in zip(series_columns, column_labels, label_positions)})
+    return series_codes, series
+
+
+def as_integer_if_complete(values):
+    if len(values) and not np.isnan(values).any() and np.array_equal(values, np.round(values)):
+        return values.astype('int64')
+    return values
+
+
+def compute_demand_change(weekly_demand, series_columns, lag=1, week_key=None):
+    return DemandMatrix(weekly_demand, series_columns).change(lag=lag, week_key=week_key)
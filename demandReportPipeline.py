@@ -0,0 +1,148 @@
+import os
+import argparse
+import pandas as pd
+from datetime import date
+from sklearn.cluster import KMeans
+from sklearn.mixture import GaussianMixture
+from sklearn.cluster import DBSCAN
+from sklearn.cluster import AgglomerativeClustering
+from sklearn.cluster import Birch
+from salesDataLoader import load_sales_data, CATALOG_FOLDER, CATALOG_FILES
+from salesAggregation import aggregate_sales
+from seriesIndex import SeriesIndex
+from demandChange import compute_demand_change
+from clusteringRunner import run_clustering
+from inventoryPolicy import inventory_policy
+from chartRendering import line_chart, pie_chart
+import excelExport
+import reportTables
+from excelExport import ChartExporter
+from reportTables import ReportTables
+from stageGraph import Stage, StageGraph
+
+# Product demand report as a stage graph:
+#   load -> aggregate -> {demand change, clustering, eoq, charts} -> export
+# The four analysis stages only depend on the aggregates and run concurrently. Their results
+# are cached under deveopedData/.stage_cache, so a rerun on unchanged data, catalogs, project code
+# and library versions only loads the cached results and writes the workbook.
+SALES_DATA_FILE = 'deveopedData/createdData.csv'
+REPORT_NAME = 'demand_report'
+
+
+def load_stage(file_path):
+    return load_sales_data(file_path)
+
+
+def aggregate_stage(sales_data):
+    return aggregate_sales(sales_data)
+
+
+def demand_change_stage(sales_aggregates):
+    product_demand = sales_aggregates.last_weeks_demand(2)
+    most_demanded_products = product_demand.groupby('Product Name', observed=True)['Quantity'].sum().reset_index().sort_values(
+        by='Quantity', ascending=False)
+    demand_change = compute_demand_change(sales_aggregates.product_demand, ['Product Name'], lag=1)
+    increase_demand = demand_change[demand_change['Change'] > 0]
+    decrease_demand = demand_change[demand_change['Change'] < 0]
+    return most_demanded_products, increase_demand, decrease_demand
+
+
+def clustering_stage(sales_aggregates):
+    algorithms = [
+        KMeans(n_clusters=3, random_state=42),
+        GaussianMixture(n_components=3, random_state=42),
+        DBSCAN(eps=3, min_samples=2),
+        AgglomerativeClustering(n_clusters=3),
+        Birch(n_clusters=3)
+    ]
+    algorithm_names = {0: 'KMeans', 1: 'GaussianMix', 2: 'DBSCAN', 3: 'AggClustering', 4: 'Birch'}
+
+    product_sales_total = sales_aggregates.product_totals.rename(columns={'Quantity': 'Total Quantity'})
+    product_sales_total['Demand Rank'] = product_sales_total['Total Quantity'].rank(ascending=False)
+    cluster_tables = []
+    for clustering_result in run_clustering(product_sales_total[['Total Quantity', 'Demand Rank']].values,
+                                            algorithms, algorithm_names):
+        product_sales_total['Cluster'] = clustering_result.labels
+        most_demanded_products = product_sales_total.groupby('Product Name', observed=True)['Cluster'].sum().reset_index(
+        ).sort_values(by='Cluster', ascending=False)
+        cluster_tables.append((f"Algorithm_{clustering_result.index}_{clustering_result.name}", most_demanded_products))
+    return cluster_tables
+
+
+def eoq_stage(sales_aggregates):
+    demand = sales_aggregates.product_demand.rename(columns={'Quantity': 'Demand'})
+    return inventory_policy(demand)
+
+
+def charts_stage(sales_aggregates):
+    # (worksheet name, image name, chart spec) per chart
+    charts = []
+    for product, product_sales in SeriesIndex(sales_aggregates.weekly_sales, 'Product Name').items():
+        charts.append((f"{product} Line Plot", f"{product}_line_plot.png",
+                       line_chart(f'Sales Data for {product}', product_sales['Date'], product_sales['Quantity'])))
+    product_sales_total = sales_aggregates.product_totals.set_index('Product Name')['Quantity']
+    charts.append(("Total Sales Pie Chart", "total_sales_pie_chart.png",
+                   pie_chart("Total Sales Distribution", product_sales_total, product_sales_total.index)))
+    return charts
+
+
+def export_stage(demand_changes, cluster_tables, eoq, charts, excel_folder):
+    most_demanded_products, increase_demand, decrease_demand = demand_changes
+    os.makedirs(excel_folder, exist_ok=True)
+    excel_filename = f"{excel_folder}/{REPORT_NAME}_{date.today()}.xlsx"
+    excel_writer = pd.ExcelWriter(excel_filename, engine='xlsxwriter')
+    report_tables = ReportTables(excel_folder, REPORT_NAME)
+
+    increase_demand.to_excel(excel_writer, sheet_name='Increase in Demand', index=False)
+    decrease_demand.to_excel(excel_writer, sheet_name='Decrease in Demand', index=False)
+    most_demanded_products.to_excel(excel_writer, sheet_name='Most Demanded Products', index=False)
+    eoq.to_excel(excel_writer, sheet_name='Demand and EOQ', index=False)
+    for sheet_name, cluster_table in cluster_tables:
+        cluster_table.to_excel(excel_writer, sheet_name=sheet_name, index=False)
+
+    report_tables.write('increase_demand', increase_demand)
+    report_tables.write('decrease_demand', decrease_demand)
+    report_tables.write('most_demanded_products', most_demanded_products)
+    report_tables.write('demand_and_eoq', eoq)
+    report_tables.write('cluster_labels', pd.concat([cluster_table.assign(Algorithm=sheet_name)
+                                                     for sheet_name, cluster_table in cluster_tables], ignore_index=True))
+
+    worksheet_names, image_names, chart_specs = zip(*charts) if charts else ([], [], [])
+    ChartExporter(excel_writer).add_chart_worksheets(worksheet_names, image_names, chart_specs)
+    excel_writer.close()
+    return excel_filename
+
+
+def demand_report_graph(file_path=SALES_DATA_FILE, excel_folder='demanded_products', cache_folder=None, max_workers=None):
+    if cache_folder is None:
+        cache_folder = os.path.join(os.path.dirname(os.path.abspath(file_path)), '.stage_cache')
+    stages = [
+        # The loader keeps its own Parquet cache, and a cached aggregate skips it entirely
+        Stage('load', load_stage, params={'file_path': file_path}, files=['file_path'], cache=False),
+        Stage('aggregate', aggregate_stage, inputs=['load']),
+        Stage('demand change', demand_change_stage, inputs=['aggregate']),
+        # Clustering and the chart images of the export use process pools, which only fork from the main thread
+        Stage('clustering', clustering_stage, inputs=['aggregate'], main_thread=True),
+        Stage('eoq', eoq_stage, inputs=['aggregate']),
+        Stage('charts', charts_stage, inputs=['aggregate']),
+        Stage('export', export_stage, inputs=['demand change', 'clustering', 'eoq', 'charts'],
+              params={'excel_folder': excel_folder}, cache=False, main_thread=True),
+    ]
+    catalog_files = [os.path.join(CATALOG_FOLDER, catalog_file) for catalog_file in CATALOG_FILES.values()]
+    return StageGraph(stages, cache_folder=cache_folder, max_workers=max_workers, dependency_files=catalog_files)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the demand report stage graph')
+    parser.add_argument('--native-charts', action='store_true', help='native Excel charts instead of chart images')
+    parser.add_argument('--report-tables', choices=['parquet', 'arrow'],
+                        help='also write the report tables, partitioned by run date')
+    arguments = parser.parse_args()
+    if arguments.native_charts:
+        excelExport.CHART_MODE = excelExport.CHART_MODE_NATIVE
+    if arguments.report_tables:
+        reportTables.REPORT_TABLE_FORMAT = arguments.report_tables
+    results, stage_runs = demand_report_graph().run()
+    for stage_run in stage_runs:
+        print(f"{stage_run.name:<15} {stage_run.status:<8} {stage_run.seconds:.3f}s")
+    print(f"Exported demand changes, clusters, EOQ and charts to {results['export']}")
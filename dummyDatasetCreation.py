@@ -1,45 +1,21 @@
+import os
 import pandas as pd
-import random
-from datetime import timedelta, datetime, date
+from datetime import date
+from syntheticSales import catalog_generator, write_sales_csv
 
-# Load the dataset containing the available products
-products_df = pd.read_excel('./load_dataset/loadDataset.xlsx')
-
-# Get the list of available products from the dataset
-available_products = products_df['Product Name'].tolist()
+# Every run draws new sales data, as the original random.randint version did; set SALES_SEED
+# (e.g. SALES_SEED=0) to regenerate the same data set
+SALES_SEED = os.environ.get('SALES_SEED') or None
 
 # Load the dataset containing the regions
 regions_df = pd.read_excel('./load_dataset/regions.xlsx')
 
-# Get the list of regions from the dataset
-available_regions = regions_df['Region'].tolist()
-
-# Start date is January 1, 2023
-start_date = datetime(2023, 1, 1)
-
-# End date is today's date
-end_date = date.today()
-
-# Generate random sales data for each product and region
-sales_data = []
-current_date = start_date
-while current_date.date() <= end_date:
-    for product in available_products:
-        region = random.choice(available_regions)  # Select a random region
-        quantity_sold = random.randint(0, 100)  # Generate a random quantity sold
-        sales_data.append({
-            'Date': current_date.strftime('%Y-%m-%d'),
-            'Product Name': product,
-            'Region': region,
-            'Quantity': quantity_sold
-        })
-    current_date += timedelta(days=1)
-
-# Create a DataFrame from the sales data
-sales_df = pd.DataFrame(sales_data)
-
-# Save the sales data to a CSV file
-sales_df.to_csv('./deveopedData/createdData.csv', index=False)
+# Generate sales data for each product of the product catalog, in a random region, for every day
+# from January 1, 2023 to today, with a random quantity from 0 to 100, in chunks of days written
+# straight to the CSV file (see syntheticSales.py for larger data sets, seasonality and trends)
+sales_seed = None if SALES_SEED is None else int(SALES_SEED)
+sales_generator = catalog_generator('2023-01-01', date.today(), seed=sales_seed, full_grid=False, distribution='uniform')
+write_sales_csv(sales_generator, './deveopedData/createdData.csv')
 
 # Save the regions data to a CSV file
 regions_df.to_csv('./deveopedData/regions.csv', index=False)
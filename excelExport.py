@@ -0,0 +1,212 @@
+import io
+import os
+import datetime
+import pandas as pd
+from matplotlib.colors import to_hex
+from chartRendering import render_charts
+
+
+# Excel export helpers.
+# Charts are embedded from in-memory PNG bytes (xlsxwriter's image_data option), so no image
+# file is written to or deleted from disk per chart.
+def insert_image_bytes(worksheet, cell, image_name, image_bytes, options=None):
+    image_options = dict(options or {})
+    image_options['image_data'] = io.BytesIO(image_bytes)
+    worksheet.insert_image(cell, image_name, image_options)
+
+
+def add_image_worksheet(excel_writer, worksheet_name, image_name, image_bytes, cell='A1'):
+    worksheet = excel_writer.book.add_worksheet(worksheet_name)
+    insert_image_bytes(worksheet, cell, image_name, image_bytes)
+    return worksheet
+
+
+# Chart export modes.
+# 'image' (the default) renders every chart to PNG bytes with chartRendering and embeds the image.
+# 'native' writes the values of every chart once as a block of cells on a shared data sheet
+# and adds an xlsxwriter line/pie/column chart that references those cells, so no matplotlib
+# rendering happens and the workbook holds numbers instead of PNGs. Callers opt in with
+# chart_mode='native', the runners with --native-charts, and any script with EXCEL_CHART_MODE=native.
+CHART_MODE_NATIVE = 'native'
+CHART_MODE_IMAGE = 'image'
+CHART_MODE = os.environ.get('EXCEL_CHART_MODE', CHART_MODE_IMAGE)
+
+CHART_DATA_SHEET = 'Chart Data'
+CHART_DATE_FORMAT = 'yyyy-mm-dd'
+
+
+class ChartExporter:
+    def __init__(self, excel_writer, chart_mode=None, data_sheet_name=CHART_DATA_SHEET):
+        self.excel_writer = excel_writer
+        self.chart_mode = CHART_MODE if chart_mode is None else chart_mode
+        if self.chart_mode not in (CHART_MODE_NATIVE, CHART_MODE_IMAGE):
+            raise ValueError(f"Unknown chart mode: {self.chart_mode}")
+        self.data_sheet_name = data_sheet_name
+        self.data_sheet = None
+        self.date_format = None
+        self.next_data_row = 0
+
+    def add_chart_worksheets(self, worksheet_names, image_names, charts, cell='A1'):
+        worksheets = [self.excel_writer.book.add_worksheet(worksheet_name) for worksheet_name in worksheet_names]
+        self.insert_charts(worksheets, [cell] * len(worksheets), image_names, charts)
+        return worksheets
+
+    def insert_charts(self, worksheets, cells, image_names, charts):
+        charts = list(charts)
+        if self.chart_mode == CHART_MODE_IMAGE:
+            for worksheet, cell, image_name, image_bytes in zip(worksheets, cells, image_names, render_charts(charts)):
+                insert_image_bytes(worksheet, cell, image_name, image_bytes)
+            return
+
+        for worksheet, cell, chart in zip(worksheets, cells, charts):
+            native_chart = self.native_chart(chart)
+            if native_chart is not None:
+                worksheet.insert_chart(cell, native_chart)
+
+    def write_data_block(self, columns):
+        # columns is a list of (header, values); returns the (first_row, last_row) of the values
+        if self.data_sheet is None:
+            self.data_sheet = self.excel_writer.book.add_worksheet(self.data_sheet_name)
+            self.date_format = self.excel_writer.book.add_format({'num_format': CHART_DATE_FORMAT})
+
+        header_row = self.next_data_row
+        row_count = max((len(values) for header, values in columns), default=0)
+        self.data_sheet.write_row(header_row, 0, [header for header, values in columns])
+
+        # Written row by row so the block also works with a constant_memory workbook
+        for offset in range(row_count):
+            for column, (header, values) in enumerate(columns):
+                if offset >= len(values) or pd.isna(values[offset]):
+                    continue
+                value = values[offset]
+                if isinstance(value, datetime.date):
+                    self.data_sheet.write_datetime(header_row + 1 + offset, column, value, self.date_format)
+                else:
+                    self.data_sheet.write(header_row + 1 + offset, column, value.item() if hasattr(value, 'item') else value)
+
+        # One blank row between the blocks of consecutive charts
+        self.next_data_row = header_row + row_count + 2
+        return header_row + 1, header_row + row_count
+
+    def cell_range(self, first_row, last_row, column):
+        return [self.data_sheet_name, first_row, column, last_row, column]
+
+    def native_chart(self, chart):
+        workbook = self.excel_writer.book
+        kind = chart['kind']
+
+        if kind == 'line' or kind == 'multi_line':
+            series = chart['series'] if kind == 'multi_line' else {chart['ylabel']: chart['y']}
+            first_row, last_row = self.write_data_block([(chart['xlabel'], chart['x'])] + list(series.items()))
+            if last_row < first_row:
+                return None
+            native_chart = workbook.add_chart({'type': 'line'})
+            for column, label in enumerate(series, start=1):
+                native_chart.add_series({'name': label,
+                                         'categories': self.cell_range(first_row, last_row, 0),
+                                         'values': self.cell_range(first_row, last_row, column),
+                                         'marker': {'type': 'circle'}})
+            x_axis = {'name': chart['xlabel'], 'num_font': {'rotation': -45}}
+            if chart['x'] and isinstance(chart['x'][0], datetime.date):
+                x_axis.update({'date_axis': True, 'num_format': CHART_DATE_FORMAT})
+            native_chart.set_x_axis(x_axis)
+            native_chart.set_y_axis({'name': chart['ylabel']})
+            if kind == 'line':
+                native_chart.set_legend({'none': True})
+        elif kind == 'pie':
+            first_row, last_row = self.write_data_block([('Label', chart['labels']), ('Value', chart['values'])])
+            if last_row < first_row:
+                return None
+            native_chart = workbook.add_chart({'type': 'pie'})
+            native_chart.add_series({'categories': self.cell_range(first_row, last_row, 0),
+                                     'values': self.cell_range(first_row, last_row, 1),
+                                     'data_labels': {'percentage': True, 'category': True, 'position': 'outside_end'}})
+            native_chart.set_legend({'none': True})
+        elif kind == 'bar':
+            first_row, last_row = self.write_data_block([(chart['xlabel'], chart['labels']), (chart['ylabel'], chart['values'])])
+            if last_row < first_row:
+                return None
+            native_chart = workbook.add_chart({'type': 'column'})
+            series = {'categories': self.cell_range(first_row, last_row, 0),
+                      'values': self.cell_range(first_row, last_row, 1)}
+            if chart['color'] is not None:
+                # Matplotlib colors may be names or RGB tuples, xlsxwriter needs '#rrggbb'
+                series['fill'] = {'color': to_hex(chart['color'])}
+            native_chart.add_series(series)
+            native_chart.set_x_axis({'name': chart['xlabel'], 'num_font': {'rotation': -45}})
+            native_chart.set_y_axis({'name': chart['ylabel']})
+            native_chart.set_legend({'none': True})
+        else:
+            raise ValueError(f"Unknown chart kind: {kind}")
+
+        native_chart.set_title({'name': chart['title']})
+        return native_chart
+
+
+# Streaming sheet export.
+# A constant_memory workbook flushes every row to a temporary file as soon as the next row is
+# started, so sheets must be written strictly row by row (DataFrame.to_excel writes column by
+# column). write_frame_streaming converts and writes one chunk of rows at a time and continues
+# on a new sheet when a sheet reaches Excel's row limit.
+EXCEL_MAX_ROWS = 1048576
+STREAM_CHUNK_ROWS = 50000
+EXCEL_SHEET_NAME_LENGTH = 31
+
+
+def streaming_excel_writer(excel_filename):
+    return pd.ExcelWriter(excel_filename, engine='xlsxwriter',
+                          engine_kwargs={'options': {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd'}})
+
+
+def split_sheet_name(sheet_name, part):
+    if part == 1:
+        return sheet_name[:EXCEL_SHEET_NAME_LENGTH]
+    suffix = f" ({part})"
+    return f"{sheet_name[:EXCEL_SHEET_NAME_LENGTH - len(suffix)]}{suffix}"
+
+
+def frame_chunks(frame, chunk_rows=STREAM_CHUNK_ROWS):
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def write_frame_streaming(excel_writer, frames, sheet_name, max_rows=EXCEL_MAX_ROWS, chunk_rows=STREAM_CHUNK_ROWS):
+    # frames is a DataFrame or an iterable of DataFrame chunks with the same columns;
+    # returns the names of the sheets that were written
+    header = None
+    if isinstance(frames, pd.DataFrame):
+        header = [str(column) for column in frames.columns]
+        frames = frame_chunks(frames, chunk_rows)
+
+    workbook = excel_writer.book
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center'})
+    sheet_names = []
+    worksheet = None
+    next_row = max_rows
+
+    for chunk in frames:
+        if header is None:
+            header = [str(column) for column in chunk.columns]
+        # Python objects with None for missing values, which xlsxwriter leaves blank
+        rows = chunk.astype(object).where(chunk.notna(), None).to_numpy().tolist()
+
+        position = 0
+        while position < len(rows):
+            if next_row >= max_rows:
+                sheet_names.append(split_sheet_name(sheet_name, len(sheet_names) + 1))
+                worksheet = workbook.add_worksheet(sheet_names[-1])
+                worksheet.write_row(0, 0, header, header_format)
+                next_row = 1
+            row_limit = min(len(rows), position + max_rows - next_row)
+            for row in rows[position:row_limit]:
+                worksheet.write_row(next_row, 0, row)
+                next_row += 1
+            position = row_limit
+
+    if not sheet_names:
+        # An empty export still gets its sheet, as with to_excel
+        sheet_names.append(split_sheet_name(sheet_name, 1))
+        worksheet = workbook.add_worksheet(sheet_names[-1])
+        if header is not None:
+            worksheet.write_row(0, 0, header, header_format)
+    return sheet_names
@@ -0,0 +1,175 @@
+import io
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from salesDataLoader import load_sales_data, encode_categorical_columns
+from salesAggregation import SalesAggregates, daily_group_columns, merge_daily_totals
+from dateParsing import parse_dates
+from weekCalendar import add_week_keys, slice_weeks, WeekCalendar
+
+
+# Incremental rollups.
+# Per-(date, product, region) totals are persisted together with a high-water mark (last
+# ingested date and, for CSV sources, the byte offset already read). Each run only parses and
+# aggregates the rows added since then, and only the stored days from the first new day on are
+# merged again. The weekly (product, region, ISO year, ISO week) totals and the SalesAggregates
+# of the reports are derived from these daily totals, so a report run does not re-read or
+# re-aggregate the history. A CSV whose already ingested part was rewritten (e.g. regenerated by
+# dummyDatasetCreation.py) triggers a full rebuild.
+ROLLUP_FOLDER_NAME = '.sales_rollup'
+TAIL_CHECK_BYTES = 1 << 16
+ROLLUP_VERSION = 3
+
+
+def rollup_paths(file_path, rollup_folder=None):
+    file_path = os.path.abspath(file_path)
+    if rollup_folder is None:
+        rollup_folder = os.path.join(os.path.dirname(file_path), ROLLUP_FOLDER_NAME)
+    rollup_name = os.path.basename(file_path) + '_' + hashlib.sha1(file_path.encode('utf-8')).hexdigest()[:12]
+    rollup_file = os.path.join(rollup_folder, f"{rollup_name}_daily.parquet")
+    state_file = os.path.join(rollup_folder, f"{rollup_name}_state.json")
+    return rollup_file, state_file
+
+
+def tail_hash(file_path, offset):
+    start = max(0, offset - TAIL_CHECK_BYTES)
+    with open(file_path, 'rb') as source_file:
+        source_file.seek(start)
+        return hashlib.sha256(source_file.read(offset - start)).hexdigest()
+
+
+def daily_totals(sales_data):
+    return sales_data.groupby(daily_group_columns(sales_data), observed=True)['Quantity'].sum().reset_index()
+
+
+def weekly_totals(daily_sales):
+    daily_sales = add_week_keys(daily_sales.copy())
+    group_columns = [column for column in ['Product Name', 'Region', 'Year', 'Week', 'Week Key'] if column in daily_sales.columns]
+    return daily_sales.groupby(group_columns, observed=True)['Quantity'].sum().reset_index()
+
+
+def merge_new_daily_totals(stored_totals, new_totals):
+    if stored_totals is None or stored_totals.empty:
+        return new_totals
+    if new_totals.empty:
+        return stored_totals
+    # The stored totals are sorted by date: only the days from the first new day on can change
+    start = np.searchsorted(stored_totals['Date'].to_numpy(), new_totals['Date'].min().to_datetime64(), side='left')
+    merged_days = merge_daily_totals([stored_totals.iloc[start:], new_totals])
+    # Re-encoded with the catalog dictionaries (plus any value only one side has seen)
+    return encode_categorical_columns(pd.concat([stored_totals.iloc[:start], merged_days], ignore_index=True))
+
+
+def read_appended_csv_rows(file_path, state, file_size):
+    # Only the bytes written after the stored offset are parsed
+    with open(file_path, 'rb') as source_file:
+        source_file.seek(state['byte_offset'])
+        appended_bytes = source_file.read(file_size - state['byte_offset'])
+    if not appended_bytes.strip():
+        return None
+    appended_rows = pd.read_csv(io.BytesIO(appended_bytes), header=None, names=state['columns'])
+    appended_rows['Date'] = parse_dates(appended_rows['Date'])
+    return encode_categorical_columns(appended_rows)
+
+
+def can_append(file_path, state):
+    if state is None or not file_path.lower().endswith('.csv'):
+        return False
+    offset = state['byte_offset']
+    # Nothing was ingested from an empty file: rebuild
+    if offset <= 0:
+        return False
+    if os.path.getsize(file_path) < offset:
+        return False
+    with open(file_path, 'rb') as source_file:
+        source_file.seek(offset - 1)
+        if source_file.read(1) != b'\n':
+            return False
+    return tail_hash(file_path, offset) == state['tail_sha256']
+
+
+def stored_high_water_mark(state):
+    if state.get('high_water_mark') is None:
+        return None
+    return pd.Timestamp(state['high_water_mark'])
+
+
+def update_daily_rollup(file_path, rollup_folder=None, rebuild=False):
+    rollup_file, state_file = rollup_paths(file_path, rollup_folder)
+    state = None
+    if not rebuild and os.path.exists(state_file) and os.path.exists(rollup_file):
+        with open(state_file) as state_json:
+            state = json.load(state_json)
+        if state.get('version') != ROLLUP_VERSION:
+            state = None
+
+    file_size = os.path.getsize(file_path)
+    high_water_mark = None
+    if state is not None and can_append(file_path, state):
+        # Append-only CSV: the byte offset marks exactly which rows were already ingested
+        stored_totals = encode_categorical_columns(pd.read_parquet(rollup_file))
+        new_rows = read_appended_csv_rows(file_path, state, file_size)
+        high_water_mark = stored_high_water_mark(state)
+        columns = state['columns']
+    elif state is not None and not file_path.lower().endswith('.csv'):
+        # Workbooks cannot be read from an offset: ingest only days after the high-water mark
+        stored_totals = encode_categorical_columns(pd.read_parquet(rollup_file))
+        new_rows = load_sales_data(file_path)
+        high_water_mark = stored_high_water_mark(state)
+        if high_water_mark is not None:
+            new_rows = new_rows[new_rows['Date'] > high_water_mark]
+        columns = list(new_rows.columns)
+    else:
+        # Full rebuild: the source is new or its already ingested part was rewritten
+        stored_totals = None
+        new_rows = load_sales_data(file_path)
+        columns = list(new_rows.columns)
+
+    if new_rows is not None and not new_rows.empty:
+        daily_rollup = merge_new_daily_totals(stored_totals, daily_totals(new_rows))
+        new_high_water_mark = new_rows['Date'].max()
+        if high_water_mark is not None:
+            new_high_water_mark = max(new_high_water_mark, high_water_mark)
+    else:
+        daily_rollup = stored_totals if stored_totals is not None else daily_totals(new_rows)
+        new_high_water_mark = high_water_mark
+
+    os.makedirs(os.path.dirname(rollup_file), exist_ok=True)
+    if daily_rollup is not stored_totals:
+        temp_rollup_file = rollup_file + '.tmp'
+        daily_rollup.to_parquet(temp_rollup_file, index=False)
+        os.replace(temp_rollup_file, rollup_file)
+
+    state = {
+        'version': ROLLUP_VERSION,
+        'high_water_mark': None if new_high_water_mark is None else str(new_high_water_mark),
+        'byte_offset': file_size,
+        'tail_sha256': tail_hash(file_path, file_size),
+        'columns': columns,
+    }
+    with open(state_file, 'w') as state_json:
+        json.dump(state, state_json)
+
+    return daily_rollup
+
+
+def update_weekly_rollup(file_path, rollup_folder=None, rebuild=False):
+    return weekly_totals(update_daily_rollup(file_path, rollup_folder, rebuild))
+
+
+def load_incremental_aggregates(file_path, rollup_folder=None, rebuild=False):
+    # The report aggregates of load_sales_aggregates, built from the incrementally updated daily totals
+    daily_sales = update_daily_rollup(file_path, rollup_folder, rebuild).copy()
+    add_week_keys(daily_sales)
+    return SalesAggregates(daily_sales)
+
+
+if __name__ == '__main__':
+    weekly_rollup = update_weekly_rollup('deveopedData/createdData.csv')
+    weekly_rollup = weekly_rollup.sort_values(by='Week Key')
+    last_two_weeks = WeekCalendar(weekly_rollup['Week Key']).last_weeks(2)
+    last_two_weeks_demand = slice_weeks(weekly_rollup, last_two_weeks[0])
+    print("\nDemand for the Last Two Weeks:")
+    print(last_two_weeks_demand.groupby(['Product Name', 'Year', 'Week'])['Quantity'].sum().reset_index().to_string(index=False))
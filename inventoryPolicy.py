@@ -0,0 +1,73 @@
+import os
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from salesDataLoader import CATALOG_FOLDER
+
+
+# Inventory policy per product (and region) and week.
+# EOQ, safety stock and reorder point are computed as whole-column NumPy operations over the
+# weekly demand table. Ordering cost, holding cost, lead time and service level come from a
+# per-product parameter table; products missing from it use the defaults below.
+#   EOQ           = sqrt(2 * ordering cost * demand / holding cost)
+#   safety stock  = z(service level) * std of weekly demand * sqrt(lead time in weeks)
+#   reorder point = mean weekly demand * lead time in weeks + safety stock
+INVENTORY_PARAMETERS_FILE = os.path.join(CATALOG_FOLDER, 'inventoryParameters.csv')
+INVENTORY_PARAMETER_DEFAULTS = {'Ordering Cost': 500.0, 'Holding Cost': 100.0, 'Lead Time Weeks': 1.0,
+                                'Service Level': 0.95}
+POLICY_DECIMALS = 2
+
+
+def load_inventory_parameters(file_path=INVENTORY_PARAMETERS_FILE):
+    if file_path is None or not os.path.exists(file_path):
+        return pd.DataFrame(columns=['Product Name'] + list(INVENTORY_PARAMETER_DEFAULTS))
+    if file_path.lower().endswith(('.xlsx', '.xls')):
+        parameters = pd.read_excel(file_path)
+    else:
+        parameters = pd.read_csv(file_path)
+    for column, default in INVENTORY_PARAMETER_DEFAULTS.items():
+        if column not in parameters.columns:
+            parameters[column] = default
+    return parameters
+
+
+def parameter_columns(products, parameters):
+    # One value per demand row, looked up once per distinct product and spread back by its codes
+    codes, unique_products = pd.factorize(products)
+    parameters = parameters.drop_duplicates('Product Name', keep='last').set_index('Product Name')
+    parameters = parameters.reindex(np.asarray(unique_products, dtype=object))
+    columns = {}
+    for column, default in INVENTORY_PARAMETER_DEFAULTS.items():
+        values = parameters[column].astype('float64').fillna(default).to_numpy()
+        columns[column] = values[codes]
+    return columns
+
+
+def service_level_z(service_levels):
+    unique_levels, positions = np.unique(service_levels, return_inverse=True)
+    z_values = np.array([NormalDist().inv_cdf(level) for level in unique_levels])
+    return z_values[positions]
+
+
+def inventory_policy(demand, parameters=None, series_columns=None, demand_column='Demand'):
+    # demand has one row per series and week; returns a copy with EOQ, Safety Stock and Reorder Point
+    if parameters is None:
+        parameters = load_inventory_parameters()
+    if series_columns is None:
+        series_columns = [column for column in ['Region', 'Product Name'] if column in demand.columns]
+
+    policy = demand.copy()
+    quantities = policy[demand_column].to_numpy(dtype='float64')
+    costs = parameter_columns(policy['Product Name'], parameters)
+
+    # Weekly demand mean and spread of each series, broadcast back to its rows
+    series_demand = policy.groupby(series_columns, observed=True, sort=False)[demand_column]
+    mean_demand = series_demand.transform('mean').to_numpy(dtype='float64')
+    demand_spread = np.nan_to_num(series_demand.transform('std').to_numpy(dtype='float64'))
+
+    lead_time = costs['Lead Time Weeks']
+    safety_stock = service_level_z(costs['Service Level']) * demand_spread * np.sqrt(lead_time)
+    policy['EOQ'] = np.round(np.sqrt(2 * costs['Ordering Cost'] * quantities / costs['Holding Cost']), POLICY_DECIMALS)
+    policy['Safety Stock'] = np.round(safety_stock, POLICY_DECIMALS)
+    policy['Reorder Point'] = np.round(mean_demand * lead_time + safety_stock, POLICY_DECIMALS)
+    return policy
@@ -1,6 +1,6 @@
 import os
+import sys
 import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import date, datetime
 from sklearn.cluster import KMeans
 from sklearn.mixture import GaussianMixture
@@ -8,28 +8,36 @@ from sklearn.cluster import DBSCAN
 from sklearn.cluster import AgglomerativeClustering
 from sklearn.cluster import Birch
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from salesDataLoader import load_sales_data
+from seriesIndex import SeriesIndex
+from weekCalendar import add_week_keys, week_key_to_monday, WeekCalendar
+from demandChange import compute_demand_change
+from clusteringRunner import run_clustering
+from chartRendering import line_chart, pie_chart
+from excelExport import ChartExporter, streaming_excel_writer, write_frame_streaming
+from reportTables import ReportTables
+from dateParsing import parse_dates
+
 
 
 def read_sales_data(file_path):
-    sales_data = pd.read_excel(file_path)
+    # Parsed once into a Parquet cache and reused while the workbook is unchanged
+    sales_data = load_sales_data(file_path)
     return sales_data
 
 
 def analyze_weekly_sales(sales_data):
-    sales_data['Date'] = pd.to_datetime(sales_data['Date'])
-    sales_data['Week'] = sales_data['Date'].dt.isocalendar().week
-    weekly_sales = sales_data.groupby(['Product Name', 'Week'])['Quantity'].sum().reset_index()
+    sales_data['Date'] = parse_dates(sales_data['Date'])
+    add_week_keys(sales_data)
+    weekly_sales = sales_data.groupby(['Product Name', 'Year', 'Week', 'Week Key'], observed=True)['Quantity'].sum().reset_index()
+    # The line plots date each week by its Monday
+    weekly_sales['Date'] = week_key_to_monday(weekly_sales['Week Key'])
     return weekly_sales
 
 
 def calculate_demand_change(product_demand):
-    last_week = product_demand['Week'].max()
-    last_two_weeks = [last_week - 1, last_week]
-    last_week_demand = product_demand[product_demand['Week'] == last_two_weeks[0]]
-    current_week_demand = product_demand[product_demand['Week'] == last_two_weeks[1]]
-    demand_change = pd.merge(current_week_demand, last_week_demand, on='Product Name', how='left')
-    demand_change['Change'] = demand_change['Quantity_x'] - demand_change['Quantity_y']
-    demand_change['Change(%)'] = (demand_change['Change'] / demand_change['Quantity_y']) * 100
+    demand_change = compute_demand_change(product_demand, ['Product Name'], lag=1)
 
     increase_demand = demand_change[demand_change['Change'] > 0]
     decrease_demand = demand_change[demand_change['Change'] < 0]
@@ -40,10 +48,10 @@ def calculate_demand_change(product_demand):
 
 
 def find_most_demanded_products(weekly_sales):
-    last_two_weeks = weekly_sales['Week'].unique()[-2:]
-    product_demand = weekly_sales.groupby(['Product Name', 'Week'])['Quantity'].sum().reset_index()
-    product_demand = product_demand[product_demand['Week'].isin(last_two_weeks)]
-    most_demanded_products = product_demand.groupby('Product Name')['Quantity'].sum().reset_index().sort_values(
+    last_two_weeks = WeekCalendar(weekly_sales['Week Key']).last_weeks(2)
+    product_demand = weekly_sales.groupby(['Product Name', 'Week Key'], observed=True)['Quantity'].sum().reset_index()
+    product_demand = product_demand[product_demand['Week Key'].isin(last_two_weeks)]
+    most_demanded_products = product_demand.groupby('Product Name', observed=True)['Quantity'].sum().reset_index().sort_values(
         by='Quantity', ascending=False)
 
     return most_demanded_products
@@ -62,69 +70,56 @@ def find_most_demanded_products(weekly_sales):
 #     return increase_demand, decrease_demand
 
 
-def export_demand_changes_to_excel(increase_demand, decrease_demand, excel_writer):
-    increase_demand.to_excel(excel_writer, sheet_name='Increase in Demand', index=False)
-    decrease_demand.to_excel(excel_writer, sheet_name='Decrease in Demand', index=False)
+def export_demand_changes_to_excel(increase_demand, decrease_demand, excel_writer, report_tables):
+    write_frame_streaming(excel_writer, increase_demand, 'Increase in Demand')
+    write_frame_streaming(excel_writer, decrease_demand, 'Decrease in Demand')
+    report_tables.write('increase_demand', increase_demand)
+    report_tables.write('decrease_demand', decrease_demand)
 
 
-def run_clustering_algorithms(product_sales_total, algorithms, algorithm_names):
-    for algorithm_index, algorithm in enumerate(algorithms):
-        algorithm.fit(product_sales_total[['Total Quantity', 'Demand Rank']].values)
-        algorithm_name = algorithm_names[algorithm_index]
-        if algorithm_name == 'GaussianMix':
-            product_sales_total['Cluster'] = algorithm.predict_proba(
-                product_sales_total[['Total Quantity', 'Demand Rank']].values).argmax(axis=1)
-        else:
-            product_sales_total['Cluster'] = algorithm.labels_
-        most_demanded_products = product_sales_total.groupby('Product Name')['Cluster'].sum().reset_index().sort_values(
+def run_clustering_algorithms(product_sales_total, algorithms, algorithm_names, report_tables):
+    cluster_tables = []
+    clustering_results = run_clustering(product_sales_total[['Total Quantity', 'Demand Rank']].values,
+                                        algorithms, algorithm_names)
+    for clustering_result in clustering_results:
+        algorithm_index = clustering_result.index
+        algorithm_name = clustering_result.name
+        product_sales_total['Cluster'] = clustering_result.labels
+        most_demanded_products = product_sales_total.groupby('Product Name', observed=True)['Cluster'].sum().reset_index().sort_values(
             by='Cluster', ascending=False)
         sheet_name = f"Algorithm_{algorithm_index}_{algorithm_name}"
-        most_demanded_products.to_excel(excel_writer, sheet_name=sheet_name, index=False)
-
+        write_frame_streaming(excel_writer, most_demanded_products, sheet_name)
+        cluster_tables.append(most_demanded_products.assign(Algorithm=sheet_name))
+    report_tables.write('cluster_labels', pd.concat(cluster_tables, ignore_index=True))
 
-def create_line_plots(weekly_sales, line_plots_folder):
-    os.makedirs(line_plots_folder, exist_ok=True)
 
-    for product in weekly_sales['Product Name'].unique():
-        product_sales = weekly_sales[weekly_sales['Product Name'] == product]
+def create_line_plots(weekly_sales):
+    product_series = SeriesIndex(weekly_sales, 'Product Name')
+    products = product_series.keys
+    line_charts = []
+    for product, product_sales in product_series.items():
 
         dates = product_sales['Date']
         quantities = product_sales['Quantity']
 
-        plt.figure()
-        plt.plot(dates, quantities, marker='o')
-        plt.title(f'Sales Data for {product}')
-        plt.xlabel('Date')
-        plt.ylabel('Quantity Sold')
-        plt.xticks(rotation=45)
-
-        line_plot_filename = os.path.join(line_plots_folder, f"{product}_line_plot.png")
-        plt.savefig(line_plot_filename)
-        plt.close()
+        line_charts.append(line_chart(f'Sales Data for {product}', dates, quantities))
 
+    return products, line_charts
 
-def create_pie_chart(total_sales, pie_chart_folder):
-    os.makedirs(pie_chart_folder, exist_ok=True)
 
-    product_sales_total = total_sales.groupby('Product Name')['Quantity'].sum()
-    plt.figure()
-    plt.pie(product_sales_total, labels=product_sales_total.index, autopct='%1.1f%%')
-    plt.title("Total Sales Distribution")
+def create_pie_chart(total_sales):
+    product_sales_total = total_sales.groupby('Product Name', observed=True)['Quantity'].sum()
+    return pie_chart("Total Sales Distribution", product_sales_total, product_sales_total.index)
 
-    pie_chart_filename = os.path.join(pie_chart_folder, "total_sales_pie_chart.png")
-    plt.savefig(pie_chart_filename)
-    plt.close()
 
-
-def export_graphs_to_excel(line_plots_folder, pie_chart_folder, excel_writer):
+def export_graphs_to_excel(line_plots, total_sales_pie_chart, excel_writer):
+    chart_exporter = ChartExporter(excel_writer)
+    products, line_charts = line_plots
     worksheet = excel_writer.book.add_worksheet("Line Plots")
+    chart_exporter.insert_charts([worksheet] * len(line_charts), [f'A{i * 10 + 1}' for i in range(len(line_charts))],
+                                 [f"{product}_line_plot.png" for product in products], line_charts)
 
-    for i, image_file in enumerate(os.listdir(line_plots_folder)):
-        image_path = os.path.join(line_plots_folder, image_file)
-        worksheet.insert_image(i * 10, 0, image_path)
-
-    worksheet = excel_writer.book.add_worksheet("Pie Charts")
-    worksheet.insert_image(0, 0, os.path.join(pie_chart_folder, "total_sales_pie_chart.png"))
+    chart_exporter.add_chart_worksheets(["Pie Charts"], ["total_sales_pie_chart.png"], [total_sales_pie_chart])
 
 
 today_date = datetime.now().strftime('%Y-%m-%d')
@@ -135,22 +130,22 @@ sales_data = read_sales_data(file_name)
 # Step 2: Analyze Weekly Sales Data
 weekly_sales = analyze_weekly_sales(sales_data)
 
-weekly_sales['Week'] = weekly_sales['SalesDate'].dt.week
-
 # Step 3: Find the Demanded Products for the Last Two Weeks
 most_demanded_products = find_most_demanded_products(weekly_sales)
 
 # Step 4: Calculate Increase and Decrease in Demand
-increase_demand, decrease_demand = calculate_demand_change(most_demanded_products)
+increase_demand, decrease_demand = calculate_demand_change(weekly_sales)
 
-# Step 5: Create a Pandas Excel Writer
+# Step 5: Create a Pandas Excel Writer (constant memory, sheets are streamed row by row)
 excel_folder = 'demanded_products'
 os.makedirs(excel_folder, exist_ok=True)
 excel_filename = f"{excel_folder}/demanded_products_{date.today()}.xlsx"
-excel_writer = pd.ExcelWriter(excel_filename, engine='xlsxwriter')
+excel_writer = streaming_excel_writer(excel_filename)
+report_tables = ReportTables(excel_folder, 'demanded_products_optimized')
 
-# Step 6: Export Increase and Decrease in Demand to Excel
-export_demand_changes_to_excel(increase_demand, decrease_demand, excel_writer)
+# Step 6: Export Increase and Decrease in Demand to Excel (and the columnar report tables)
+report_tables.write('most_demanded_products', most_demanded_products)
+export_demand_changes_to_excel(increase_demand, decrease_demand, excel_writer, report_tables)
 
 # Step 7: Define the list of algorithms
 algorithms = [
@@ -170,23 +165,21 @@ algorithm_names = {
 }
 
 # Step 8: Calculate product_sales_total
-product_sales_total = weekly_sales.groupby('Product Name')['Quantity'].sum().reset_index()
+product_sales_total = weekly_sales.groupby('Product Name', observed=True)['Quantity'].sum().reset_index()
 product_sales_total = product_sales_total.rename(columns={'Quantity': 'Total Quantity'})
 product_sales_total['Demand Rank'] = product_sales_total['Total Quantity'].rank(ascending=False)
 
 # Step 9: Run Clustering Algorithms
-run_clustering_algorithms(product_sales_total, algorithms, algorithm_names)
+run_clustering_algorithms(product_sales_total, algorithms, algorithm_names, report_tables)
 
 # Step 10: Create Line Plots
-line_plots_folder = 'line_plots'
-create_line_plots(weekly_sales, line_plots_folder)
+line_plots = create_line_plots(weekly_sales)
 
 # Step 11: Create Pie Chart
-pie_chart_folder = 'pie_charts'
-create_pie_chart(weekly_sales, pie_chart_folder)
+total_sales_pie_chart = create_pie_chart(weekly_sales)
 
-# Step 12: Export Line Plots and Pie Chart to Excel
-export_graphs_to_excel(line_plots_folder, pie_chart_folder, excel_writer)
+# Step 12: Export Line Plots and Pie Chart to Excel (native Excel charts or rendered images)
+export_graphs_to_excel(line_plots, total_sales_pie_chart, excel_writer)
 
 # Step 13: Save and Close the Excel File
 excel_writer._save()
@@ -1,29 +1,9 @@
-import pandas as pd
-import random
+import os
+import sys
 from datetime import datetime, timedelta
 
-class Product:
-    def __init__(self, name):
-        self.name = name
-
-class Region:
-    def __init__(self, name):
-        self.name = name
-
-class SalesData:
-    def __init__(self, product, region, date, quantity):
-        self.product = product
-        self.region = region
-        self.date = date
-        self.quantity = quantity
-
-# Load the dataset containing the available products
-products_df = pd.read_excel('../load_dataset/loadDataset.xlsx')
-available_products = products_df['Product Name'].tolist()
-
-# Load the dataset containing the available regions
-regions_df = pd.read_excel('../load_dataset/regions.xlsx')
-available_regions = regions_df['Region'].tolist()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from syntheticSales import catalog_generator, sales_frame
 
 # Get the start date and end date
 start_date_str = '2023-01-01'  # Change this to your desired start date
@@ -40,26 +20,11 @@ else:
     next_month = start_date.replace(day=28) + timedelta(days=4)
     end_date = next_month - timedelta(days=next_month.day)
 
-# Generate random sales data for each product and region
-sales_data = []
-current_date = start_date
-while current_date <= end_date:
-    for product_name in available_products:
-        product = Product(product_name)
-        for region_name in available_regions:
-            region = Region(region_name)
-            quantity_sold = random.randint(0, 100)  # Generate a random quantity sold
-            sales_entry = SalesData(product, region, current_date.strftime('%Y-%m-%d'), quantity_sold)
-            sales_data.append(sales_entry)
-    current_date += timedelta(days=1)
-
-# Create a DataFrame from the sales data
-sales_df = pd.DataFrame([{
-    'Product Name': entry.product.name,
-    'Region': entry.region.name,
-    'Date': entry.date,
-    'Quantity': entry.quantity
-} for entry in sales_data])
+# Generate sales data for each product and region of the catalogs in load_dataset, for every day,
+# with a random quantity from 0 to 100
+sales_df = sales_frame(catalog_generator(start_date.date(), end_date.date(), distribution='uniform'))
+sales_df['Date'] = sales_df['Date'].dt.strftime('%Y-%m-%d')
+sales_df = sales_df[['Product Name', 'Region', 'Date', 'Quantity']]
 
 # Generate the file name with an underscore and today's date
 today_date = datetime.now().strftime('%Y-%m-%d')
@@ -0,0 +1,131 @@
+import os
+import glob
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from dateParsing import parse_dates, ORDER_DATE_FORMAT
+from salesStore import SalesStore
+
+
+# Ingestion of the monthly raw order exports (input/Sales_<Month>_<Year>.csv).
+# The files are read concurrently (the pyarrow CSV reader releases the GIL, so threads are
+# enough and no frame is pickled between processes), every column as text so repeated header
+# rows and blank rows cannot change the inferred types, and the frames are concatenated once.
+ORDER_FILE_PATTERN = 'Sales_*.csv'
+ORDER_COLUMNS = ['Order ID', 'Product', 'Quantity Ordered', 'Price Each', 'Order Date', 'Purchase Address']
+ORDER_COLUMN_DTYPES = {column: 'str' for column in ORDER_COLUMNS}
+ORDER_COLUMN_NAMES = {'Order ID': 'order id', 'Product': 'product', 'Quantity Ordered': 'qty', 'Price Each': 'price',
+                      'Order Date': 'order date', 'Purchase Address': 'purchase address'}
+
+# Cleaning rules.
+# Every removed row is counted under the first rule it fails, in this order. Blank and repeated
+# header rows are found per file while reading; the other rules run as one vectorized pass
+# over the typed columns (order dates in the fixed ORDER_DATE_FORMAT) followed by a single filter.
+# "917 1st St, Dallas, TX 75001" -> city "Dallas", state "TX"
+ADDRESS_PATTERN = r',\s*(?P<city>[^,]+?),\s*(?P<state>[A-Z]{2})\s+\d{5}(?:-\d{4})?\s*$'
+CLEANING_RULES = ['blank', 'repeated header', 'duplicate', 'invalid order id', 'invalid quantity', 'invalid price',
+                  'invalid order date']
+
+
+def order_files(input_folder, pattern=ORDER_FILE_PATTERN):
+    return sorted(glob.glob(os.path.join(input_folder, pattern)))
+
+
+def read_order_file(file_path):
+    order_data = pd.read_csv(file_path, dtype=ORDER_COLUMN_DTYPES, engine='pyarrow')
+    # Some exports carry spaces around the header names
+    order_data = order_data.rename(columns=str.strip)
+
+    blank = order_data.isna().all(axis=1)
+    repeated_header = order_data['Order ID'] == 'Order ID'
+    removed_rows = {'blank': int(blank.sum()), 'repeated header': int(repeated_header.sum())}
+    return order_data[~(blank | repeated_header)], removed_rows
+
+
+def read_order_files(input_folder, pattern=ORDER_FILE_PATTERN, max_workers=None):
+    file_paths = order_files(input_folder, pattern)
+    if not file_paths:
+        raise FileNotFoundError(f"No order files matching {pattern} in {input_folder}")
+    if max_workers is None:
+        max_workers = min(len(file_paths), os.cpu_count() or 1)
+
+    if max_workers <= 1:
+        file_results = [read_order_file(file_path) for file_path in file_paths]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            file_results = list(executor.map(read_order_file, file_paths))
+
+    removed_rows = dict.fromkeys(CLEANING_RULES, 0)
+    for order_data, file_removed_rows in file_results:
+        for rule, count in file_removed_rows.items():
+            removed_rows[rule] += count
+    order_data = pd.concat([order_data for order_data, file_removed_rows in file_results], ignore_index=True)
+    return order_data, removed_rows
+
+
+def split_address(addresses):
+    # Regex extraction in Arrow; rows that do not match get a missing city and state
+    address_parts = pc.extract_regex(pa.array(addresses, type=pa.string()), ADDRESS_PATTERN)
+    return (pc.struct_field(address_parts, 'city').to_pandas().to_numpy(),
+            pc.struct_field(address_parts, 'state').to_pandas().to_numpy())
+
+
+def clean_order_data(order_data, removed_rows=None):
+    removed_rows = dict.fromkeys(CLEANING_RULES, 0) if removed_rows is None else dict(removed_rows)
+    order_data = order_data.rename(columns=ORDER_COLUMN_NAMES)
+
+    # Blank and repeated header rows are normally gone already (read_order_files)
+    blank = order_data.isna().all(axis=1)
+    repeated_header = order_data['qty'] == 'Quantity Ordered'
+    duplicate = order_data.duplicated()
+
+    order_ids = pd.to_numeric(order_data['order id'], errors='coerce')
+    quantities = pd.to_numeric(order_data['qty'], errors='coerce')
+    prices = pd.to_numeric(order_data['price'], errors='coerce')
+    order_dates = parse_dates(order_data['order date'], ORDER_DATE_FORMAT, errors='coerce')
+
+    rule_failures = [('blank', blank),
+                     ('repeated header', repeated_header & ~blank),
+                     ('duplicate', duplicate),
+                     ('invalid order id', order_ids.isna()),
+                     ('invalid quantity', quantities.isna() | (quantities != quantities.round())),
+                     ('invalid price', prices.isna()),
+                     ('invalid order date', order_dates.isna())]
+    removed = pd.Series(False, index=order_data.index)
+    for rule, failed in rule_failures:
+        failed = failed & ~removed
+        removed_rows[rule] += int(failed.sum())
+        removed |= failed
+
+    kept = ~removed
+    clean_data = pd.DataFrame({
+        'order id': order_ids[kept].astype('int64'),
+        'product': order_data.loc[kept, 'product'],
+        'qty': quantities[kept].astype('int64'),
+        'price': prices[kept].astype('float64'),
+        'order date': order_dates[kept],
+        'purchase address': order_data.loc[kept, 'purchase address'],
+    })
+    clean_data['month'] = clean_data['order date'].dt.month
+    clean_data['city'], clean_data['state'] = split_address(clean_data['purchase address'])
+    clean_data['total sales'] = clean_data['qty'] * clean_data['price']
+    return clean_data.reset_index(drop=True), removed_rows
+
+
+def load_order_data(input_folder, pattern=ORDER_FILE_PATTERN, max_workers=None):
+    # Returns the cleaned orders and the number of rows removed by each cleaning rule
+    order_data, removed_rows = read_order_files(input_folder, pattern, max_workers)
+    return clean_order_data(order_data, removed_rows)
+
+
+def order_sales_rows(order_data):
+    # Cleaned orders as sales rows: order day, product, city as the region, quantity ordered
+    return pd.DataFrame({'Date': order_data['order date'].dt.floor('D'), 'Product Name': order_data['product'],
+                         'Region': order_data['city'], 'Quantity': order_data['qty']}).dropna()
+
+
+def store_order_data(input_folder, store_path, pattern=ORDER_FILE_PATTERN, max_workers=None):
+    # Appends the cleaned orders of the matching files to a sales store (see salesStore.py)
+    order_data, removed_rows = load_order_data(input_folder, pattern, max_workers)
+    return SalesStore(store_path).append_frame(order_sales_rows(order_data)), removed_rows
@@ -0,0 +1,216 @@
+import os
+import time
+import argparse
+import resource
+import subprocess
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, DBSCAN, AgglomerativeClustering, Birch
+from sklearn.mixture import GaussianMixture
+from salesDataLoader import load_sales_data
+from salesAggregation import aggregate_sales
+from seriesIndex import SeriesIndex
+from demandChange import compute_demand_change
+from clusteringRunner import run_clustering
+from chartRendering import line_chart, pie_chart
+from excelExport import ChartExporter
+from syntheticSales import numbered_generator, write_sales_csv
+
+
+# End-to-end benchmark of the demand report pipeline.
+# Synthetic data sets are generated once per scale (seeded, so every run measures the same
+# rows) and the stages of the analysis scripts are run on them one after another. Every stage
+# records its wall time, the peak of memory traced by tracemalloc during the stage (Python
+# objects and NumPy buffers) and the process peak RSS after it. Each run is appended to one
+# CSV file and compared with the previous run of the same scale and stage.
+BENCHMARK_FOLDER_NAME = 'benchmark_results'
+BENCHMARK_DATA_FOLDER_NAME = 'data'
+BENCHMARK_RESULTS_FILE = 'benchmark_results.csv'
+BENCHMARK_SEED = 42
+BENCHMARK_START_DATE = '2023-01-02'
+# Line charts are added for at most this many products (one worksheet each, as in analysis.py)
+BENCHMARK_CHART_LIMIT = 1000
+
+# rows = products x regions x days
+BENCHMARK_SCALES = {
+    '1k': {'products': 10, 'regions': 1, 'days': 100},
+    '100k': {'products': 1000, 'regions': 1, 'days': 100},
+    '100k-regions': {'products': 10, 'regions': 500, 'days': 20},
+    '10M': {'products': 100000, 'regions': 1, 'days': 100},
+    '10M-regions': {'products': 200, 'regions': 500, 'days': 100},
+}
+DEFAULT_BENCHMARK_SCALES = ['1k', '100k', '100k-regions']
+BENCHMARK_STAGES = ['load', 'aggregate', 'demand change', 'clustering', 'charting', 'excel export']
+
+
+def benchmark_algorithms():
+    # The algorithms of analysis.py
+    algorithms = [
+        KMeans(n_clusters=3, random_state=42),
+        GaussianMixture(n_components=3, random_state=42),
+        DBSCAN(eps=3, min_samples=2),
+        AgglomerativeClustering(n_clusters=3),
+        Birch(n_clusters=3)
+    ]
+    algorithm_names = {0: 'KMeans', 1: 'GaussianMix', 2: 'DBSCAN', 3: 'AggClustering', 4: 'Birch'}
+    return algorithms, algorithm_names
+
+
+def max_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+
+class StageTimer:
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    @contextmanager
+    def stage(self, stage_name):
+        if self.trace_memory:
+            tracemalloc.start()
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start_time
+            peak_traced_mb = None
+            if self.trace_memory:
+                peak_traced_mb = tracemalloc.get_traced_memory()[1] / (1 << 20)
+                tracemalloc.stop()
+            self.stages.append({'stage': stage_name, 'seconds': seconds, 'peak_traced_mb': peak_traced_mb,
+                                'max_rss_mb': max_rss_mb()})
+
+
+def benchmark_dataset(scale_name, data_folder):
+    scale = BENCHMARK_SCALES[scale_name]
+    file_path = os.path.join(data_folder, f"sales_{scale_name}_seed{BENCHMARK_SEED}.csv")
+    if not os.path.exists(file_path):
+        os.makedirs(data_folder, exist_ok=True)
+        end_date = np.datetime64(BENCHMARK_START_DATE) + scale['days'] - 1
+        generator = numbered_generator(scale['products'], scale['regions'], BENCHMARK_START_DATE, end_date,
+                                       seed=BENCHMARK_SEED, weekly_seasonality=0.1, yearly_seasonality=0.2,
+                                       weight_spread=0.5, distribution='poisson')
+        write_sales_csv(generator, file_path)
+    return file_path
+
+
+def run_pipeline(file_path, excel_filename, timer, chart_limit=BENCHMARK_CHART_LIMIT):
+    with timer.stage('load'):
+        sales_data = load_sales_data(file_path, use_cache=False)
+
+    with timer.stage('aggregate'):
+        sales_aggregates = aggregate_sales(sales_data)
+
+    with timer.stage('demand change'):
+        product_demand = sales_aggregates.last_weeks_demand(2)
+        most_demanded_products = product_demand.groupby('Product Name', observed=True)['Quantity'].sum().reset_index(
+        ).sort_values(by='Quantity', ascending=False)
+        demand_change = compute_demand_change(sales_aggregates.product_demand, ['Product Name'], lag=1)
+        if sales_aggregates.has_region:
+            region_demand_change = compute_demand_change(sales_aggregates.region_product_demand,
+                                                         ['Region', 'Product Name'], lag=1)
+            demand_change = pd.concat([demand_change, region_demand_change], ignore_index=True)
+
+    with timer.stage('clustering'):
+        product_sales_total = sales_aggregates.product_totals.rename(columns={'Quantity': 'Total Quantity'})
+        product_sales_total['Demand Rank'] = product_sales_total['Total Quantity'].rank(ascending=False)
+        algorithms, algorithm_names = benchmark_algorithms()
+        clustering_results = run_clustering(product_sales_total[['Total Quantity', 'Demand Rank']].values,
+                                            algorithms, algorithm_names)
+        cluster_tables = []
+        for clustering_result in clustering_results:
+            cluster_tables.append((f"Algorithm_{clustering_result.index}_{clustering_result.name}",
+                                   product_sales_total[['Product Name']].assign(Cluster=clustering_result.labels)))
+
+    with timer.stage('charting'):
+        excel_writer = pd.ExcelWriter(excel_filename, engine='xlsxwriter')
+        chart_exporter = ChartExporter(excel_writer)
+        product_series = SeriesIndex(sales_aggregates.weekly_sales, 'Product Name')
+        products = product_series.keys[:chart_limit]
+        line_charts = [line_chart(f'Sales Data for {product}', product_sales['Date'], product_sales['Quantity'])
+                       for product, product_sales in zip(products, (product_series.series(product) for product in products))]
+        chart_exporter.add_chart_worksheets([f"{product} Line Plot"[:31] for product in products],
+                                            [f"{product}_line_plot.png" for product in products], line_charts)
+        product_totals = sales_aggregates.product_totals.set_index('Product Name')['Quantity']
+        chart_exporter.add_chart_worksheets(["Total Sales Pie Chart"], ["total_sales_pie_chart.png"],
+                                            [pie_chart("Total Sales Distribution", product_totals, product_totals.index)])
+
+    with timer.stage('excel export'):
+        most_demanded_products.to_excel(excel_writer, sheet_name='Most Demanded Products', index=False)
+        demand_change[demand_change['Change'] > 0].to_excel(excel_writer, sheet_name='Increase in Demand', index=False)
+        demand_change[demand_change['Change'] < 0].to_excel(excel_writer, sheet_name='Decrease in Demand', index=False)
+        for sheet_name, cluster_table in cluster_tables:
+            cluster_table.to_excel(excel_writer, sheet_name=sheet_name, index=False)
+        excel_writer.close()
+    return len(sales_data)
+
+
+def run_benchmarks(scale_names=None, output_folder=BENCHMARK_FOLDER_NAME, trace_memory=True,
+                   chart_limit=BENCHMARK_CHART_LIMIT):
+    scale_names = DEFAULT_BENCHMARK_SCALES if scale_names is None else scale_names
+    data_folder = os.path.join(output_folder, BENCHMARK_DATA_FOLDER_NAME)
+    run_id = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+    commit = git_commit()
+
+    results = []
+    for scale_name in scale_names:
+        file_path = benchmark_dataset(scale_name, data_folder)
+        timer = StageTimer(trace_memory)
+        excel_filename = os.path.join(data_folder, f"report_{scale_name}.xlsx")
+        rows = run_pipeline(file_path, excel_filename, timer, chart_limit)
+        os.remove(excel_filename)
+        for stage in timer.stages:
+            results.append(dict({'run_id': run_id, 'commit': commit, 'scale': scale_name, 'rows': rows},
+                                **{key: BENCHMARK_SCALES[scale_name][key] for key in ['products', 'regions']},
+                                **stage))
+
+    results = pd.DataFrame(results)
+    results_file = os.path.join(output_folder, BENCHMARK_RESULTS_FILE)
+    results.to_csv(results_file, mode='a', header=not os.path.exists(results_file), index=False)
+    return results_file, run_id
+
+
+def compare_runs(results_file, run_id=None, baseline_run_id=None):
+    # Stage times of a run (default: the latest) next to a baseline run (default: the run before it)
+    results = pd.read_csv(results_file)
+    run_ids = sorted(results['run_id'].unique())
+    run_id = run_ids[-1] if run_id is None else run_id
+    if baseline_run_id is None:
+        earlier_run_ids = [earlier_run_id for earlier_run_id in run_ids if earlier_run_id < run_id]
+        baseline_run_id = earlier_run_ids[-1] if earlier_run_ids else None
+
+    columns = ['scale', 'stage', 'rows', 'seconds', 'peak_traced_mb']
+    comparison = results[results['run_id'] == run_id][columns]
+    if baseline_run_id is None:
+        return comparison
+    baseline = results[results['run_id'] == baseline_run_id][['scale', 'stage', 'seconds', 'peak_traced_mb']]
+    comparison = comparison.merge(baseline, on=['scale', 'stage'], how='left', suffixes=('', ' baseline'))
+    comparison['change(%)'] = (comparison['seconds'] / comparison['seconds baseline'] - 1) * 100
+    return comparison
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the demand report pipeline stages')
+    parser.add_argument('--scales', nargs='+', choices=list(BENCHMARK_SCALES), default=DEFAULT_BENCHMARK_SCALES)
+    parser.add_argument('--output-folder', default=BENCHMARK_FOLDER_NAME)
+    parser.add_argument('--chart-limit', type=int, default=BENCHMARK_CHART_LIMIT)
+    parser.add_argument('--no-memory', action='store_true', help='time only (tracemalloc slows Python allocations)')
+    arguments = parser.parse_args()
+
+    results_file, run_id = run_benchmarks(arguments.scales, arguments.output_folder, not arguments.no_memory,
+                                          arguments.chart_limit)
+    print(f"Benchmark run {run_id} appended to {results_file}")
+    print(compare_runs(results_file, run_id).to_string(index=False))
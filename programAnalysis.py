@@ -7,31 +7,27 @@ from sklearn.mixture import GaussianMixture
 from sklearn.cluster import DBSCAN
 from sklearn.cluster import AgglomerativeClustering
 from sklearn.cluster import Birch
-
-# Step 1: Data Collection
-sales_data = pd.read_csv('deveopedData/analysisDataWithRegion_2023-06-05.csv')
-
-# Step 2: Analyze Weekly Sales Data
-sales_data['Date'] = pd.to_datetime(sales_data['Date'])
-sales_data = sales_data.groupby(['Date', 'Product Name', 'Region'])['Quantity'].sum().reset_index()
-
-# Step 3: Analyze Weekly Sales Data
-sales_data['Week'] = sales_data['Date'].dt.isocalendar().week
-weekly_sales = sales_data.groupby(['Product Name', 'Region', 'Week', 'Date'])['Quantity'].sum().reset_index()
+from salesAggregation import load_sales_aggregates
+from seriesIndex import SeriesIndex
+from demandChange import compute_demand_change
+from clusteringRunner import run_clustering, group_ranges, merge_group_results
+from chartRendering import line_chart, bar_chart
+from excelExport import ChartExporter
+from reportTables import ReportTables
+
+# Step 1: Data Collection and Step 2-3: Analyze Weekly Sales Data (aggregated once)
+sales_aggregates = load_sales_aggregates('deveopedData/analysisDataWithRegion_2023-06-05.csv')
+weekly_sales = sales_aggregates.region_weekly_sales[['Product Name', 'Region', 'Week', 'Date', 'Quantity']].sort_values(
+    by=['Product Name', 'Region', 'Week', 'Date'])
 
 # Step 4: Find the Demanded Products for the Last Two Weeks
-last_two_weeks = weekly_sales['Week'].unique()[-2:]
-product_demand = weekly_sales.groupby(['Product Name', 'Region', 'Week'])['Quantity'].sum().reset_index()
-product_demand = product_demand[product_demand['Week'].isin(last_two_weeks)]
-most_demanded_products = product_demand.groupby(['Region', 'Product Name'])['Quantity'].sum().reset_index().sort_values(
+product_demand = sales_aggregates.last_weeks_demand(2, by_region=True)[
+    ['Product Name', 'Region', 'Year', 'Week', 'Week Key', 'Quantity']].sort_values(by=['Product Name', 'Region', 'Week Key'])
+most_demanded_products = product_demand.groupby(['Region', 'Product Name'], observed=True)['Quantity'].sum().reset_index().sort_values(
     by=['Region', 'Quantity'], ascending=[True, False])
 
 # Step 5: Calculate Increase and Decrease in Demand
-last_week_demand = product_demand[product_demand['Week'] == last_two_weeks[0]]
-current_week_demand = product_demand[product_demand['Week'] == last_two_weeks[1]]
-demand_change = pd.merge(current_week_demand, last_week_demand, on=['Product Name', 'Region'], how='left')
-demand_change['Change'] = demand_change['Quantity_x'] - demand_change['Quantity_y']
-demand_change['Change(%)'] = (demand_change['Change'] / demand_change['Quantity_y']) * 100
+demand_change = compute_demand_change(sales_aggregates.region_product_demand, ['Product Name', 'Region'], lag=1)
 
 # Separate increase and decrease in demand
 increase_demand = demand_change[demand_change['Change'] > 0]
@@ -42,10 +38,14 @@ excel_folder = 'demanded_products'
 os.makedirs(excel_folder, exist_ok=True)  # Create the demanded_products directory
 excel_filename = f"{excel_folder}/demanded_products_with_graph{date.today().strftime('%Y-%m-%d')}.xlsx"
 excel_writer = pd.ExcelWriter(excel_filename, engine='xlsxwriter')
+report_tables = ReportTables(excel_folder, 'demanded_products_with_graph')
 
-# Step 9: Export Increase and Decrease in Demand to Excel
+# Step 9: Export Increase and Decrease in Demand to Excel (and the columnar report tables)
 increase_demand.to_excel(excel_writer, sheet_name='Increase in Demand', index=False)
 decrease_demand.to_excel(excel_writer, sheet_name='Decrease in Demand', index=False)
+report_tables.write('increase_demand', increase_demand)
+report_tables.write('decrease_demand', decrease_demand)
+report_tables.write('most_demanded_products', most_demanded_products)
 
 # Step 10: Define the list of algorithms
 algorithms = [
@@ -66,18 +66,19 @@ algorithm_names = {
 }
 
 # Step 12: Calculate product_sales_total
-product_sales_total = weekly_sales.groupby(['Product Name', 'Region'])['Quantity'].sum().reset_index()
+product_sales_total = sales_aggregates.region_product_totals[['Product Name', 'Region', 'Quantity']].sort_values(
+    by=['Region', 'Product Name']).reset_index(drop=True)
 product_sales_total = product_sales_total.rename(columns={'Quantity': 'Total Quantity'})
-product_sales_total['Demand Rank'] = product_sales_total.groupby('Region')['Total Quantity'].rank(ascending=False)
-
-for algorithm_index, algorithm in enumerate(algorithms):
-    algorithm.fit(product_sales_total[['Total Quantity', 'Demand Rank']].values)
-    algorithm_name = algorithm_names[algorithm_index]
-    if algorithm_name == 'GaussianMix':
-        # For Gaussian Mixture, we can calculate the cluster based on the highest probability
-        product_sales_total['Cluster'] = algorithm.predict_proba(product_sales_total[['Total Quantity', 'Demand Rank']].values).argmax(axis=1)
-    else:
-        product_sales_total['Cluster'] = algorithm.labels_
+product_sales_total['Demand Rank'] = product_sales_total.groupby('Region', observed=True)['Total Quantity'].rank(ascending=False)
+
+cluster_tables = []
+# Every algorithm is fitted on each region's rows on its own, as the Demand Rank is ranked within the region
+clustering_results = merge_group_results(run_clustering(product_sales_total[['Total Quantity', 'Demand Rank']].values, algorithms,
+                                                        algorithm_names, groups=group_ranges(product_sales_total['Region'])))
+for clustering_result in clustering_results:
+    algorithm_index = clustering_result.index
+    algorithm_name = clustering_result.name
+    product_sales_total['Cluster'] = clustering_result.labels
     # most_demanded_products = product_sales_total.groupby(['Region', 'Product Name'])['Cluster'].sum().reset_index().sort_values(
         # by=['Region', 'Cluster'], ascending=[True, False])
     
@@ -85,45 +86,42 @@ for algorithm_index, algorithm in enumerate(algorithms):
     # by=['Region', 'Total Quantity'], ascending=[True, False])
 
 
-    most_demanded_products = product_sales_total.groupby(['Region', 'Product Name'])['Total Quantity'].sum().reset_index().sort_values(
+    most_demanded_products = product_sales_total.groupby(['Region', 'Product Name'], observed=True)['Total Quantity'].sum().reset_index().sort_values(
     by=['Region', 'Total Quantity'], ascending=[True, False])
     most_demanded_products = most_demanded_products.rename(columns={'Total Quantity': 'Quantity'})
 
 
     sheet_name = f"Algorithm_{algorithm_index}_{algorithm_name}"
     most_demanded_products.to_excel(excel_writer, sheet_name=sheet_name, index=False)
+    cluster_tables.append(most_demanded_products.assign(Algorithm=sheet_name))
+report_tables.write('cluster_labels', pd.concat(cluster_tables, ignore_index=True))
 
-# Step 13: Create Line Plots for Each Product and Region and Save them as Images
-os.makedirs('line_plots', exist_ok=True)  # Create the line_plots directory
-
+# Step 13: Create Line Plots for Each Product and Region (native Excel charts or rendered images)
+chart_exporter = ChartExporter(excel_writer)
 row_counter = 0  # Counter for Excel rows
 
+line_chart_keys = []
+line_charts = []
+region_product_series = SeriesIndex(weekly_sales, ['Region', 'Product Name'])
 for region in weekly_sales['Region'].unique():
     for product in weekly_sales['Product Name'].unique():
-        product_sales = weekly_sales[(weekly_sales['Product Name'] == product) & (weekly_sales['Region'] == region)]
+        product_sales = region_product_series.series((region, product))
 
         # Prepare data for plotting
-        dates = product_sales['Date']
-        quantities = product_sales['Quantity']
-
-        # Create a line plot for the sales data
-        plt.figure()
-        plt.plot(dates, quantities, marker='o')
-        plt.title(f'Sales Data for {product} ({region})')
-        plt.xlabel('Date')
-        plt.ylabel('Quantity Sold')
-        plt.xticks(rotation=45)
+        line_chart_keys.append((region, product))
+        line_charts.append(line_chart(f'Sales Data for {product} ({region})', product_sales['Date'], product_sales['Quantity']))
 
-        # Save the line plot as an image
-        image_filename = f"line_plots/{product}_{region}_line_plot.png"
-        plt.savefig(image_filename)
-        plt.close()
+line_plot_worksheets = []
+line_plot_cells = []
+for region, product in line_chart_keys:
+    # Add the line plot worksheet to the Excel file
+    worksheet_name = f"{product} Line Plot ({region})"
+    line_plot_worksheets.append(excel_writer.book.add_worksheet(worksheet_name))
+    row_counter += 20  # Increment row counter for each line plot
+    line_plot_cells.append(f'A{row_counter}')
 
-        # Add the line plot image to the Excel file
-        worksheet_name = f"{product} Line Plot ({region})"
-        worksheet = excel_writer.book.add_worksheet(worksheet_name)
-        row_counter += 20  # Increment row counter for each line plot
-        worksheet.insert_image(f'A{row_counter}', image_filename)
+chart_exporter.insert_charts(line_plot_worksheets, line_plot_cells,
+                             [f"{product}_{region}_line_plot.png" for region, product in line_chart_keys], line_charts)
 
 
         # color_index = (color_index + 1) % len(colors)
@@ -136,26 +134,23 @@ colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
 color_index = 0
 
 # Iterate over each region and plot the most demanded products
-for region in most_demanded_products['Region'].unique():
-    region_products = most_demanded_products[most_demanded_products['Region'] == region]['Product Name']
-    product_quantities = most_demanded_products[most_demanded_products['Region'] == region]['Quantity']
+regions = most_demanded_products['Region'].unique()
+region_series = SeriesIndex(most_demanded_products, 'Region')
+bar_charts = []
+for region in regions:
+    region_products = region_series.series(region)['Product Name']
+    product_quantities = region_series.series(region)['Quantity']
 
     # Create a bar chart for the most demanded products
-    plt.bar(region_products, product_quantities, color=colors[color_index])
-    plt.title(f'Most Demanded Products in {region}')
-    plt.xlabel('Product Name')
-    plt.ylabel('Quantity')
-
-    # Save the bar chart as an image
-    image_filename = f"bar_charts/{region}_most_demanded_products.png"
-    plt.savefig(image_filename)
-    plt.close()
-
-    # Add the bar chart image to the Excel file
-    worksheet_graphs.insert_image(f'A{color_index*15+1}', image_filename)
-
+    bar_charts.append(bar_chart(f'Most Demanded Products in {region}', region_products, product_quantities,
+                                ylabel='Quantity', color=colors[color_index]))
     color_index = (color_index + 1) % len(colors)
 
+# Add the bar charts to the Excel file
+chart_exporter.insert_charts([worksheet_graphs] * len(regions),
+                             [f'A{(chart_index % len(colors))*15+1}' for chart_index in range(len(regions))],
+                             [f"{region}_most_demanded_products.png" for region in regions], bar_charts)
+
 # Step 15: Save and Close the Excel File
 excel_writer._save()
 excel_writer.close()
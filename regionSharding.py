@@ -0,0 +1,138 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from salesAggregation import aggregate_sales
+from seriesIndex import SeriesIndex
+from demandChange import DemandMatrix
+from weekCalendar import add_week_keys, slice_weeks, WeekCalendar
+from chartRendering import line_chart, pie_chart, bar_chart
+
+
+# Region-sharded execution of the region reports.
+# The sales rows are partitioned by Region once (a stable sort with start/end offsets per
+# region), and every region shard is aggregated, compared week over week, ranked and charted on
+# its own worker. Workers are forked after the partitioning and get the partitioned table through
+# the pool initializer, so they read their rows from the inherited table instead of receiving a
+# pickled copy, and only the small per-region tables and chart specs are sent back and merged.
+# Shards run in-process when other threads are alive (a fork taken while another thread holds a
+# lock can deadlock the child). Week windows (last N weeks, the current week) are those of the
+# whole data set, as in the unsharded reports.
+SHARD_MIN_ROWS = 50000
+SHARD_CHART_KINDS = ('line', 'pie', 'bar')
+
+# Set in the worker processes only, by the pool initializer
+forked_shards = None
+
+
+class RegionShardResult:
+    def __init__(self, region):
+        self.region = region
+        self.region_product_totals = None
+        self.last_weeks_demand = None
+        self.demand_change = None
+        self.line_charts = {}
+        self.pie_chart = None
+        self.bar_chart = None
+
+
+def sales_week_calendar(sales_data):
+    # Week keys of the distinct dates only
+    dates = pd.DataFrame({'Date': pd.Series(sales_data['Date'].unique())})
+    return WeekCalendar(add_week_keys(dates)['Week Key'])
+
+
+def region_demand_change(region_product_demand, series_columns, current_week_key, lag):
+    demand_matrix = DemandMatrix(region_product_demand, series_columns)
+    demand_change = demand_matrix.change(lag=lag)
+    # A region without sales in the overall current week has no rows, as with the full matrix
+    if demand_matrix.week_keys[-1] != current_week_key:
+        return demand_change.iloc[:0]
+    return demand_change
+
+
+def region_shard(region, shard_data, products, last_week_keys, series_columns, lag, chart_kinds):
+    result = RegionShardResult(region)
+    sales_aggregates = aggregate_sales(shard_data)
+
+    region_product_totals = sales_aggregates.region_product_totals
+    region_product_totals['Demand Rank'] = region_product_totals['Quantity'].rank(ascending=False)
+    result.region_product_totals = region_product_totals
+    result.last_weeks_demand = slice_weeks(sales_aggregates.region_product_demand, last_week_keys[0])
+    result.demand_change = region_demand_change(sales_aggregates.region_product_demand, series_columns, last_week_keys[-1], lag)
+
+    if 'line' in chart_kinds:
+        # Every product gets a chart, an empty one where the region has no sales of it
+        weekly_sales = sales_aggregates.region_weekly_sales.sort_values(by=['Product Name', 'Week', 'Date'])
+        product_series = SeriesIndex(weekly_sales, 'Product Name')
+        for product in products:
+            product_sales = product_series.series(product)
+            result.line_charts[product] = line_chart(f'Sales Data for {product} ({region})',
+                                                     product_sales['Date'], product_sales['Quantity'])
+    if 'pie' in chart_kinds:
+        result.pie_chart = pie_chart(f'Total Sales Distribution ({region})', region_product_totals['Quantity'],
+                                     region_product_totals['Product Name'], labeldistance=1.05)
+    if 'bar' in chart_kinds:
+        most_demanded_products = result.last_weeks_demand.groupby(['Region', 'Product Name'], observed=True)[
+            'Quantity'].sum().reset_index().sort_values(by='Quantity', ascending=False, kind='stable')
+        result.bar_chart = bar_chart(f'Demanded Products in {region}', most_demanded_products['Product Name'],
+                                     most_demanded_products['Quantity'])
+    return result
+
+
+def set_forked_shards(shards):
+    global forked_shards
+    forked_shards = shards
+
+
+def forked_region_shard(position, products, last_week_keys, series_columns, lag, chart_kinds):
+    region = forked_shards.keys[position]
+    shard_data = forked_shards.frame.iloc[forked_shards.starts[position]:forked_shards.ends[position]]
+    return region_shard(region, shard_data, products, last_week_keys, series_columns, lag, chart_kinds)
+
+
+def parallel_context():
+    # Forking is only safe while this is the only thread of the process
+    if threading.active_count() > 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context('fork')
+
+
+def run_region_shards(sales_data, last_weeks=2, series_columns=('Region', 'Product Name'), lag=1,
+                      chart_kinds=SHARD_CHART_KINDS, max_workers=None, min_rows=SHARD_MIN_ROWS):
+    # Returns one RegionShardResult per region, in region order
+    shards = SeriesIndex(sales_data[['Date', 'Product Name', 'Region', 'Quantity']], 'Region')
+    products = sorted(sales_data['Product Name'].unique())
+    series_columns = list(series_columns)
+    last_week_keys = sales_week_calendar(sales_data).last_weeks(last_weeks)
+    if max_workers is None:
+        max_workers = min(len(shards), os.cpu_count() or 1)
+
+    context = parallel_context()
+    if context is None or max_workers <= 1 or len(shards.frame) < min_rows:
+        return [region_shard(region, shard_data, products, last_week_keys, series_columns, lag, chart_kinds)
+                for region, shard_data in shards.items()]
+
+    # The initializer arguments of a forked pool are inherited by the workers, not pickled
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=set_forked_shards,
+                             initargs=(shards,)) as executor:
+        futures = [executor.submit(forked_region_shard, position, products, last_week_keys, series_columns, lag,
+                                   chart_kinds)
+                   for position in range(len(shards))]
+        return [future.result() for future in futures]
+
+
+def merge_shard_tables(shard_results, table_name):
+    tables = [getattr(shard_result, table_name) for shard_result in shard_results]
+    # Empty shard tables are left out, so they cannot change the merged dtypes
+    non_empty_tables = [table for table in tables if len(table)] or tables[:1]
+    if not non_empty_tables:
+        return pd.DataFrame()
+    return pd.concat(non_empty_tables, ignore_index=True)
+
+
+def merge_demand_change(shard_results, series_columns=('Region', 'Product Name')):
+    # Sorted by the series columns, as one demand matrix over all regions returns it
+    demand_change = merge_shard_tables(shard_results, 'demand_change')
+    return demand_change.sort_values(by=list(series_columns), kind='stable').reset_index(drop=True)
@@ -0,0 +1,65 @@
+import os
+from datetime import date
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+# Columnar copies of the report tables for downstream jobs.
+# Optionally (off by default), next to its Excel workbook, every report stage writes its table as
+#   <output folder>/tables/<report name>/<table name>/run_date=<YYYY-MM-DD>/part-0.<parquet|arrow>
+# The run_date partitions are Hive-style, so one run is a single file and all runs read as one
+# pyarrow dataset. Arrow files are uncompressed IPC files that consumers can memory-map.
+TABLES_FOLDER_NAME = 'tables'
+# None writes the Excel reports only; callers opt in with table_format='parquet' or 'arrow', the
+# runners with --report-tables, and any script with REPORT_TABLE_FORMAT=parquet (or arrow)
+REPORT_TABLE_FORMAT = os.environ.get('REPORT_TABLE_FORMAT') or None
+TABLE_FILE_NAME = 'part-0'
+
+
+class ReportTables:
+    def __init__(self, output_folder, report_name, run_date=None, table_format=None):
+        self.report_folder = os.path.join(output_folder, TABLES_FOLDER_NAME, report_name)
+        self.run_date = str(run_date or date.today())
+        self.table_format = REPORT_TABLE_FORMAT if table_format is None else table_format
+        if self.table_format not in (None, 'parquet', 'arrow'):
+            raise ValueError(f"Unknown report table format: {self.table_format}")
+
+    def table_path(self, table_name, run_date=None, table_format=None):
+        run_date = self.run_date if run_date is None else str(run_date)
+        table_format = table_format or self.table_format or 'parquet'
+        return os.path.join(self.report_folder, table_name, f"run_date={run_date}", f"{TABLE_FILE_NAME}.{table_format}")
+
+    def write(self, table_name, frame):
+        if self.table_format is None:
+            return None
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table_path = self.table_path(table_name)
+        os.makedirs(os.path.dirname(table_path), exist_ok=True)
+
+        # Rerunning a report on the same day replaces that day's partition
+        # (the temporary file starts with '.', so datasets never pick up a partial write)
+        temp_table_path = os.path.join(os.path.dirname(table_path), f".{os.path.basename(table_path)}.tmp")
+        if self.table_format == 'arrow':
+            with pa.OSFile(temp_table_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        else:
+            pq.write_table(table, temp_table_path)
+        os.replace(temp_table_path, table_path)
+        return table_path
+
+    def read(self, table_name, run_date=None, table_format=None):
+        # One run is read (memory-mapped) from its file; without a run date all runs are read
+        # with a run_date column taken from the partition folders
+        table_format = table_format or self.table_format or 'parquet'
+        if run_date is not None:
+            table_path = self.table_path(table_name, run_date, table_format)
+            if table_format == 'arrow':
+                with pa.memory_map(table_path) as source:
+                    return pa.ipc.open_file(source).read_all().to_pandas()
+            return pq.read_table(table_path, memory_map=True).to_pandas()
+
+        dataset = ds.dataset(os.path.join(self.report_folder, table_name), partitioning='hive',
+                             format='ipc' if table_format == 'arrow' else 'parquet')
+        return dataset.to_table().to_pandas()
@@ -0,0 +1,106 @@
+import os
+import pandas as pd
+from salesDataLoader import load_sales_data, read_sales_chunks, encode_categorical_columns
+from weekCalendar import add_week_keys, split_week_keys, slice_weeks, WeekCalendar
+
+
+# Shared aggregation engine used by the analysis scripts.
+# The raw sales rows are grouped exactly once (by Date, Product Name and Region) and every
+# coarser level (weekly, per product, per region) is derived from that small daily table.
+# Weekly demand tables are sorted by 'Week Key' so week ranges are sliced, not filtered.
+#
+# Out-of-core mode: a sales file larger than OUT_OF_CORE_MIN_BYTES is not loaded at once. It is
+# streamed in chunks of CHUNK_ROWS rows, every chunk is reduced to its (Date, Product Name,
+# Region) sums, and the partial sums are merged into the daily table whenever they add up to
+# another chunk's worth of rows. Peak memory follows the number of distinct keys (plus two
+# chunks), not the number of rows, and the daily table is the same as a single pass returns.
+SALES_COLUMNS = ['Date', 'Product Name', 'Region', 'Quantity']
+CHUNK_ROWS = 1000000
+OUT_OF_CORE_MIN_BYTES = 1 << 30
+
+
+def weekly_demand(daily_sales, group_columns):
+    demand = daily_sales.groupby(['Week Key'] + group_columns, observed=True)['Quantity'].sum().reset_index()
+    demand['Year'], demand['Week'] = split_week_keys(demand['Week Key'])
+    return demand[group_columns + ['Year', 'Week', 'Week Key', 'Quantity']]
+
+
+class SalesAggregates:
+    def __init__(self, daily_sales):
+        self.daily_sales = daily_sales
+        self.has_region = 'Region' in daily_sales.columns
+
+        # Product level: one row per product per day, with its ISO year and week
+        self.weekly_sales = daily_sales.groupby(
+            ['Product Name', 'Year', 'Week', 'Date'], observed=True)['Quantity'].sum().reset_index()
+        self.product_demand = weekly_demand(daily_sales, ['Product Name'])
+        self.product_totals = self.product_demand.groupby('Product Name', observed=True)['Quantity'].sum().reset_index()
+        self.week_calendar = WeekCalendar(self.product_demand['Week Key'])
+
+        # Region level: the daily table is already unique per region, product and date
+        if self.has_region:
+            self.region_weekly_sales = daily_sales[['Region', 'Product Name', 'Year', 'Week', 'Date', 'Quantity']].sort_values(
+                by=['Region', 'Product Name', 'Date']).reset_index(drop=True)
+            self.region_product_demand = weekly_demand(daily_sales, ['Region', 'Product Name'])
+            self.region_product_totals = self.region_product_demand.groupby(
+                ['Region', 'Product Name'], observed=True)['Quantity'].sum().reset_index()
+            self.region_totals = self.region_product_totals.groupby('Region', observed=True)['Quantity'].sum().reset_index()
+        else:
+            self.region_weekly_sales = None
+            self.region_product_demand = None
+            self.region_product_totals = None
+            self.region_totals = None
+
+    def last_weeks_demand(self, week_count, by_region=False):
+        demand = self.region_product_demand if by_region else self.product_demand
+        last_weeks = self.week_calendar.last_weeks(week_count)
+        if len(last_weeks) == 0:
+            return demand.iloc[:0]
+        return slice_weeks(demand, last_weeks[0])
+
+
+def aggregate_sales(sales_data):
+    # Single pass over the raw rows
+    daily_sales = sales_data.groupby(daily_group_columns(sales_data), observed=True)['Quantity'].sum().reset_index()
+    add_week_keys(daily_sales)
+    return SalesAggregates(daily_sales)
+
+
+def daily_group_columns(sales_data):
+    return ['Date', 'Product Name'] + (['Region'] if 'Region' in sales_data.columns else [])
+
+
+def merge_daily_totals(daily_totals):
+    # Re-encoded after the concat, so partial sums with differing categories still group on codes
+    combined = encode_categorical_columns(pd.concat(daily_totals, ignore_index=True))
+    return combined.groupby(daily_group_columns(combined), observed=True)['Quantity'].sum().reset_index()
+
+
+def aggregate_sales_chunked(file_path, chunk_rows=CHUNK_ROWS):
+    daily_sales = None
+    partial_totals = []
+    partial_rows = 0
+    for sales_chunk in read_sales_chunks(file_path, chunk_rows, columns=SALES_COLUMNS):
+        partial_totals.append(sales_chunk.groupby(daily_group_columns(sales_chunk), observed=True)[
+            'Quantity'].sum().reset_index())
+        partial_rows += len(partial_totals[-1])
+        if partial_rows >= chunk_rows:
+            daily_sales = merge_daily_totals(([] if daily_sales is None else [daily_sales]) + partial_totals)
+            partial_totals = []
+            partial_rows = 0
+    if partial_totals or daily_sales is None:
+        daily_sales = merge_daily_totals(([] if daily_sales is None else [daily_sales]) + partial_totals)
+
+    add_week_keys(daily_sales)
+    return SalesAggregates(daily_sales)
+
+
+def load_sales_aggregates(file_path, use_cache=True, chunk_rows=None):
+    # chunk_rows forces the out-of-core mode; by default it is used for large CSV and Parquet files
+    if chunk_rows is None and file_path.lower().endswith(('.csv', '.parquet')) \
+            and os.path.getsize(file_path) >= OUT_OF_CORE_MIN_BYTES:
+        chunk_rows = CHUNK_ROWS
+    if chunk_rows is not None:
+        return aggregate_sales_chunked(file_path, chunk_rows)
+    sales_data = load_sales_data(file_path, use_cache=use_cache)
+    return aggregate_sales(sales_data)
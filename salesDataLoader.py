@@ -0,0 +1,152 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+import pandas as pd
+import pyarrow.parquet as pq
+from dateParsing import parse_dates
+from salesStore import SalesStore, is_sales_store
+
+
+# Typed columnar cache for the sales data sources.
+# A CSV/XLSX file is parsed once into Parquet (dates as datetime64, product and region as
+# categorical codes) and reused on later runs while the source file is unchanged.
+CACHE_FOLDER_NAME = '.sales_cache'
+CATEGORICAL_COLUMNS = ['Product Name', 'Region']
+
+# Category dictionaries.
+# Product and region columns are encoded once with the catalog workbooks as their dictionary,
+# so every file shares the same integer code for a product or region and grouping and filtering
+# run on the codes. Values missing from a catalog are added to its dictionary; the categories
+# are kept sorted, so code order is name order and the reports keep their sort order.
+CATALOG_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'load_dataset')
+CATALOG_FILES = {'Product Name': 'loadDataset.xlsx', 'Region': 'regions.xlsx'}
+
+
+def file_fingerprint(file_path):
+    stat = os.stat(file_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def file_content_hash(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as source_file:
+        for block in iter(lambda: source_file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_paths(file_path, cache_folder=None):
+    file_path = os.path.abspath(file_path)
+    if cache_folder is None:
+        cache_folder = os.path.join(os.path.dirname(file_path), CACHE_FOLDER_NAME)
+    cache_name = os.path.basename(file_path) + '_' + hashlib.sha1(file_path.encode('utf-8')).hexdigest()[:12]
+    cache_file = os.path.join(cache_folder, f"{cache_name}.parquet")
+    meta_file = os.path.join(cache_folder, f"{cache_name}.json")
+    return cache_file, meta_file
+
+
+@lru_cache(maxsize=None)
+def load_catalog(column):
+    catalog_file = os.path.join(CATALOG_FOLDER, CATALOG_FILES[column])
+    if not os.path.exists(catalog_file):
+        return ()
+    return tuple(pd.read_excel(catalog_file)[column].dropna().astype(str).unique())
+
+
+def category_dictionary(column, values):
+    observed = values.cat.categories if isinstance(values.dtype, pd.CategoricalDtype) else values.dropna().unique()
+    return sorted(set(load_catalog(column)).union(observed))
+
+
+def encode_categorical_columns(sales_data):
+    for column in CATEGORICAL_COLUMNS:
+        if column not in sales_data.columns:
+            continue
+        categories = category_dictionary(column, sales_data[column])
+        if isinstance(sales_data[column].dtype, pd.CategoricalDtype):
+            if list(sales_data[column].cat.categories) != categories:
+                sales_data[column] = sales_data[column].cat.set_categories(categories)
+        else:
+            sales_data[column] = pd.Categorical(sales_data[column], categories=categories)
+    return sales_data
+
+
+def parse_sales_file(file_path):
+    if file_path.lower().endswith(('.xlsx', '.xls')):
+        sales_data = pd.read_excel(file_path)
+    elif file_path.lower().endswith('.parquet'):
+        sales_data = pd.read_parquet(file_path)
+    else:
+        sales_data = pd.read_csv(file_path)
+
+    sales_data['Date'] = parse_dates(sales_data['Date'])
+    return encode_categorical_columns(sales_data)
+
+
+def read_sales_chunks(file_path, chunk_rows, columns=None):
+    # Parsed and encoded chunks of at most chunk_rows rows, read one at a time (CSV, Parquet and
+    # sales stores)
+    if is_sales_store(file_path):
+        sales_store = SalesStore(file_path, create=False)
+        chunks = (sales_store.to_frame(start, start + chunk_rows) for start in range(0, len(sales_store), chunk_rows))
+    elif file_path.lower().endswith('.parquet'):
+        parquet_file = pq.ParquetFile(file_path)
+        if columns is not None:
+            columns = [column for column in columns if column in parquet_file.schema_arrow.names]
+        chunks = (batch.to_pandas() for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns))
+    elif file_path.lower().endswith('.csv'):
+        usecols = None if columns is None else (lambda column: column in columns)
+        chunks = pd.read_csv(file_path, chunksize=chunk_rows, usecols=usecols)
+    else:
+        raise ValueError(f"Cannot read {file_path} in chunks (CSV and Parquet only)")
+
+    for sales_chunk in chunks:
+        sales_chunk['Date'] = parse_dates(sales_chunk['Date'])
+        yield encode_categorical_columns(sales_chunk)
+
+
+def read_cache_meta(meta_file):
+    if not os.path.exists(meta_file):
+        return None
+    with open(meta_file) as meta:
+        return json.load(meta)
+
+
+def write_cache_meta(meta_file, fingerprint, content_hash):
+    with open(meta_file, 'w') as meta:
+        json.dump(dict(fingerprint, sha256=content_hash), meta)
+
+
+def load_sales_data(file_path, cache_folder=None, use_cache=True):
+    # A sales store is memory-mapped, there is nothing to parse or cache (see salesStore.py for what is copied)
+    if is_sales_store(file_path):
+        return encode_categorical_columns(SalesStore(file_path, create=False).to_frame())
+    if not use_cache:
+        return parse_sales_file(file_path)
+
+    cache_file, meta_file = cache_paths(file_path, cache_folder)
+    fingerprint = file_fingerprint(file_path)
+    cached_meta = read_cache_meta(meta_file)
+
+    if cached_meta is not None and os.path.exists(cache_file):
+        # Same size and mtime: trust the cache without reading the source
+        # (the cached categories are re-checked against the current catalogs)
+        if cached_meta['size'] == fingerprint['size'] and cached_meta['mtime_ns'] == fingerprint['mtime_ns']:
+            return encode_categorical_columns(pd.read_parquet(cache_file))
+
+        # Touched or copied but identical content: refresh the fingerprint and reuse
+        if cached_meta['size'] == fingerprint['size']:
+            content_hash = file_content_hash(file_path)
+            if content_hash == cached_meta.get('sha256'):
+                write_cache_meta(meta_file, fingerprint, content_hash)
+                return encode_categorical_columns(pd.read_parquet(cache_file))
+
+    sales_data = parse_sales_file(file_path)
+
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    temp_cache_file = cache_file + '.tmp'
+    sales_data.to_parquet(temp_cache_file, index=False)
+    os.replace(temp_cache_file, cache_file)
+    write_cache_meta(meta_file, fingerprint, file_content_hash(file_path))
+    return sales_data
@@ -0,0 +1,148 @@
+import os
+import json
+import fcntl
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+
+# Append-only binary sales store.
+# A store is a folder with one fixed-width binary file per column (day number since 1970-01-01,
+# product code, region code, quantity) and a JSON file with the committed row count and the
+# product and region dictionaries (code -> name, in the order the names were first appended).
+# Opening a store parses nothing: columns() memory-maps the column files without copying them.
+# to_frame() wraps the quantity map as it is, but converts the day numbers to datetime64 (one new
+# column) and pandas narrows the int32 codes of the categoricals (two new small columns);
+# load_sales_data then re-encodes the categoricals to the sorted catalog dictionaries.
+# An append writes the new rows to the end of every column file and then commits the row count,
+# so readers never see a partly written append, and the bytes of an interrupted append are cut
+# off by the next one. Appends hold an exclusive lock on the store, so concurrent writers (threads
+# or processes) take turns, each starting from the rows and dictionaries the previous one committed.
+SALES_STORE_SUFFIX = '.salesstore'
+STORE_META_FILE = 'store.json'
+STORE_LOCK_FILE = 'store.lock'
+STORE_VERSION = 1
+STORE_COLUMNS = {'day': np.dtype('int32'), 'product': np.dtype('int32'), 'region': np.dtype('int32'),
+                 'quantity': np.dtype('int64')}
+STORE_DICTIONARIES = {'product': 'products', 'region': 'regions'}
+
+
+def is_sales_store(path):
+    return os.path.isfile(os.path.join(path, STORE_META_FILE))
+
+
+def day_numbers(dates):
+    return np.asarray(pd.Series(dates).to_numpy(dtype='datetime64[D]')).astype('int32')
+
+
+class SalesStore:
+    def __init__(self, store_path, create=True):
+        self.store_path = store_path
+        self.meta_file = os.path.join(store_path, STORE_META_FILE)
+        if os.path.exists(self.meta_file):
+            self.meta = self.read_meta()
+        elif create:
+            os.makedirs(store_path, exist_ok=True)
+            with self.writer_lock():
+                if os.path.exists(self.meta_file):
+                    self.meta = self.read_meta()
+                else:
+                    self.meta = {'version': STORE_VERSION, 'rows': 0, 'products': [], 'regions': []}
+                    self.commit()
+        else:
+            raise FileNotFoundError(f"No sales store at {store_path}")
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def column_file(self, column):
+        return os.path.join(self.store_path, f"{column}.bin")
+
+    def read_meta(self):
+        with open(self.meta_file) as meta_file:
+            meta = json.load(meta_file)
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported sales store version in {self.store_path}: {meta.get('version')}")
+        return meta
+
+    @contextmanager
+    def writer_lock(self):
+        with open(os.path.join(self.store_path, STORE_LOCK_FILE), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def commit(self):
+        temp_meta_file = self.meta_file + '.tmp'
+        with open(temp_meta_file, 'w') as meta:
+            json.dump(self.meta, meta)
+        os.replace(temp_meta_file, self.meta_file)
+
+    def dictionary_codes(self, column, values):
+        # Codes of the values in the column dictionary; names not seen before get new codes
+        dictionary = self.meta[STORE_DICTIONARIES[column]]
+        values = pd.Series(values)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            value_codes, names = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            value_codes, names = pd.factorize(values)
+        if (value_codes < 0).any():
+            raise ValueError(f"Sales rows without a {column} cannot be stored")
+
+        known_codes = {name: code for code, name in enumerate(dictionary)}
+        name_codes = np.empty(len(names), dtype=STORE_COLUMNS[column])
+        for position, name in enumerate(map(str, names)):
+            if name not in known_codes:
+                known_codes[name] = len(dictionary)
+                dictionary.append(name)
+            name_codes[position] = known_codes[name]
+        return name_codes[value_codes]
+
+    def append(self, dates, products, regions, quantities):
+        # Returns the number of rows appended
+        with self.writer_lock():
+            # Another writer may have committed since this store was opened
+            self.meta = self.read_meta()
+            columns = {'day': day_numbers(dates),
+                       'product': self.dictionary_codes('product', products),
+                       'region': self.dictionary_codes('region', regions),
+                       'quantity': np.asarray(quantities, dtype=STORE_COLUMNS['quantity'])}
+            row_count = len(columns['day'])
+            if any(len(values) != row_count for values in columns.values()):
+                raise ValueError("Sales store columns must have the same length")
+            if row_count == 0:
+                return 0
+
+            for column, values in columns.items():
+                with open(self.column_file(column), 'ab') as column_file:
+                    # Drop whatever an interrupted append left after the committed rows
+                    column_file.truncate(len(self) * STORE_COLUMNS[column].itemsize)
+                    values.astype(STORE_COLUMNS[column], copy=False).tofile(column_file)
+                    column_file.flush()
+                    os.fsync(column_file.fileno())
+            self.meta['rows'] += row_count
+            self.commit()
+            return row_count
+
+    def append_frame(self, sales_data):
+        return self.append(sales_data['Date'], sales_data['Product Name'], sales_data['Region'], sales_data['Quantity'])
+
+    def columns(self):
+        # Read-only memory maps of the committed rows (no parsing, no copy)
+        if len(self) == 0:
+            return {column: np.empty(0, dtype=dtype) for column, dtype in STORE_COLUMNS.items()}
+        return {column: np.memmap(self.column_file(column), dtype=dtype, mode='r', shape=(len(self),))
+                for column, dtype in STORE_COLUMNS.items()}
+
+    def to_frame(self, start=0, stop=None):
+        # Rows start:stop as a sales DataFrame; the quantities stay a view of the memory map,
+        # product and region are categoricals over the store dictionaries
+        columns = {column: np.asarray(values[start:stop]) for column, values in self.columns().items()}
+        return pd.DataFrame({
+            'Date': columns['day'].astype('datetime64[D]').astype('datetime64[us]'),
+            'Product Name': pd.Categorical.from_codes(columns['product'], self.meta['products']),
+            'Region': pd.Categorical.from_codes(columns['region'], self.meta['regions']),
+            'Quantity': columns['quantity'],
+        }, copy=False)
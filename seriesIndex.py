@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+
+# Grouped-series index.
+# A frame is sorted once by its series columns (a product, or a region and product pair) with a
+# stable sort, so rows keep their order (e.g. by date) inside a series, and every series is then
+# the block of rows between its start and end offsets. Looking up or iterating the series slices
+# those blocks, so one pass over all series is linear in the rows instead of one boolean mask
+# over the whole frame per series.
+def column_codes(values):
+    # Categorical columns already carry sorted integer codes
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values, sort=True)
+
+
+class SeriesIndex:
+    def __init__(self, frame, series_columns):
+        self.series_columns = [series_columns] if isinstance(series_columns, str) else list(series_columns)
+        codes = []
+        labels = []
+        for column in self.series_columns:
+            column_code, column_labels = column_codes(frame[column])
+            codes.append(column_code)
+            labels.append(column_labels)
+
+        # Rows with a missing series value belong to no series
+        present = np.logical_and.reduce([column_code >= 0 for column_code in codes])
+        if not present.all():
+            frame = frame[present]
+            codes = [column_code[present] for column_code in codes]
+
+        # np.lexsort is stable and sorts by its last key first
+        order = np.lexsort(codes[::-1]) if len(frame) else np.arange(0)
+        if np.array_equal(order, np.arange(len(order))):
+            self.frame = frame.reset_index(drop=True)
+        else:
+            self.frame = frame.iloc[order].reset_index(drop=True)
+        codes = [column_code[order] for column_code in codes]
+
+        starts_series = np.zeros(len(order), dtype=bool)
+        starts_series[:1] = True
+        for column_code in codes:
+            starts_series[1:] |= column_code[1:] != column_code[:-1]
+        self.starts = np.flatnonzero(starts_series)
+        self.ends = np.append(self.starts[1:], len(order))
+
+        key_labels = [column_labels.take(column_code[self.starts]) for column_code, column_labels in zip(codes, labels)]
+        if len(self.series_columns) == 1:
+            self.keys = list(key_labels[0])
+        else:
+            self.keys = list(zip(*key_labels))
+        self.positions = {key: position for position, key in enumerate(self.keys)}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def series(self, key):
+        # A key without rows gives an empty frame, as a boolean filter would
+        position = self.positions.get(key)
+        if position is None:
+            return self.frame.iloc[:0]
+        return self.frame.iloc[self.starts[position]:self.ends[position]]
+
+    def items(self):
+        for key, start, end in zip(self.keys, self.starts, self.ends):
+            yield key, self.frame.iloc[start:end]
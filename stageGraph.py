@@ -0,0 +1,265 @@
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import inspect
+import platform
+import importlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+# Declarative stage graph with a concurrent, caching scheduler.
+# A stage is a function whose arguments are the results of other stages (by name) plus fixed
+# parameters. Every stage gets a cache key from its name, its parameters, the source code of its
+# function and of every project module that function's module imports (directly or through
+# other project modules), the versions of Python and the libraries below, the contents of the
+# graph's dependency files (e.g. the catalogs the loader reads) and the keys of its inputs; the
+# keys of the source stages also cover the contents of their input files. A cached stage whose
+# key is unchanged is loaded from the cache instead of being run, and a stage whose result is not
+# needed (every stage using it is cached) is neither run nor loaded. Stages whose inputs are
+# ready run concurrently on the pool. The process pools inside a stage never fork next to other
+# threads, so stages that use them (clustering, chart rendering) are marked main_thread: they run
+# in the main thread once the pool is idle and its threads are shut down, and fork as usual.
+# Storing a new key for a stage removes the cache files of its older keys.
+STAGE_CACHE_FOLDER_NAME = '.stage_cache'
+KEY_LIBRARIES = ['numpy', 'pandas', 'pyarrow', 'sklearn', 'matplotlib', 'xlsxwriter']
+
+
+def file_content_key(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as source_file:
+        for block in iter(lambda: source_file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dependency_file_key(file_path):
+    return file_content_key(file_path) if os.path.exists(file_path) else 'missing'
+
+
+def project_module_files(function):
+    # Files of the function's module and of the project modules it reaches through its globals
+    # (modules, and the modules of imported functions and classes); project = the module's folder
+    module = sys.modules.get(function.__module__)
+    if getattr(module, '__file__', None) is None:
+        return []
+    project_folder = os.path.dirname(os.path.abspath(module.__file__)) + os.sep
+    files = set()
+    pending = [module]
+    while pending:
+        module = pending.pop()
+        module_file = getattr(module, '__file__', None)
+        if module_file is None:
+            continue
+        module_file = os.path.abspath(module_file)
+        if module_file in files or not module_file.startswith(project_folder) or 'site-packages' in module_file:
+            continue
+        files.add(module_file)
+        for value in vars(module).values():
+            if inspect.ismodule(value):
+                pending.append(value)
+            elif isinstance(getattr(value, '__module__', None), str) and value.__module__ in sys.modules:
+                pending.append(sys.modules[value.__module__])
+    return sorted(files)
+
+
+def library_versions():
+    versions = {'python': platform.python_version()}
+    for library in KEY_LIBRARIES:
+        try:
+            versions[library] = getattr(importlib.import_module(library), '__version__', None)
+        except ImportError:
+            versions[library] = None
+    return versions
+
+
+def function_source_key(function):
+    try:
+        source = inspect.getsource(function)
+    except (OSError, TypeError):
+        source = function.__qualname__
+    digest = hashlib.sha256(source.encode('utf-8'))
+    for module_file in project_module_files(function):
+        digest.update(f"{module_file}:{file_content_key(module_file)}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class Stage:
+    def __init__(self, name, function, inputs=(), params=None, files=(), cache=True, main_thread=False):
+        # inputs: names of the stages whose results are passed as positional arguments;
+        # params: keyword arguments; files: params holding input file paths (keyed by content);
+        # main_thread: run in the main thread, with no pool threads alive (for stages that fork)
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.params = dict(params or {})
+        self.files = list(files)
+        self.cache = cache
+        self.main_thread = main_thread
+
+
+class StageRun:
+    def __init__(self, name, key, status, seconds):
+        self.name = name
+        self.key = key
+        self.status = status  # 'ran', 'cached' or 'skipped'
+        self.seconds = seconds
+
+
+class StageGraph:
+    def __init__(self, stages, cache_folder=STAGE_CACHE_FOLDER_NAME, max_workers=None, executor_class=ThreadPoolExecutor,
+                 dependency_files=()):
+        # dependency_files: files every stage may read besides its inputs (keyed by content)
+        self.stages = {stage.name: stage for stage in stages}
+        self.dependency_files = list(dependency_files)
+        self.cache_folder = cache_folder
+        self.max_workers = max_workers
+        self.executor_class = executor_class
+        self.order = self.topological_order()
+
+    def topological_order(self):
+        order = []
+        state = {}
+
+        def visit(name):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Stage graph has a cycle through {name}")
+            if name not in self.stages:
+                raise KeyError(f"Unknown stage: {name}")
+            state[name] = 'visiting'
+            for input_name in self.stages[name].inputs:
+                visit(input_name)
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def stage_keys(self):
+        environment = {'libraries': library_versions(),
+                       'files': {file_path: dependency_file_key(file_path) for file_path in self.dependency_files}}
+        keys = {}
+        for name in self.order:
+            stage = self.stages[name]
+            params = {param: (file_content_key(value) if param in stage.files else value)
+                      for param, value in stage.params.items()}
+            key_source = json.dumps({'name': name, 'params': params, 'function': function_source_key(stage.function),
+                                     'environment': environment, 'inputs': [keys[input_name] for input_name in stage.inputs]},
+                                    sort_keys=True, default=str)
+            keys[name] = hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+        return keys
+
+    def cache_prefix(self, name):
+        return name.replace(' ', '_') + '-'
+
+    def cache_file(self, name, key):
+        return os.path.join(self.cache_folder, f"{self.cache_prefix(name)}{key[:16]}.pickle")
+
+    def is_cached(self, name, key):
+        return self.cache_folder is not None and self.stages[name].cache and os.path.exists(self.cache_file(name, key))
+
+    def load_cached(self, name, key):
+        with open(self.cache_file(name, key), 'rb') as cached:
+            return pickle.load(cached)
+
+    def store_cached(self, name, key, result):
+        if self.cache_folder is None or not self.stages[name].cache:
+            return
+        os.makedirs(self.cache_folder, exist_ok=True)
+        cache_file = self.cache_file(name, key)
+        with open(cache_file + '.tmp', 'wb') as cached:
+            pickle.dump(result, cached, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(cache_file + '.tmp', cache_file)
+        self.remove_stale_cached(name, key)
+
+    def remove_stale_cached(self, name, key):
+        # Cache files of the stage's other keys can never be loaded again
+        prefix = self.cache_prefix(name)
+        current_file = os.path.basename(self.cache_file(name, key))
+        for file_name in os.listdir(self.cache_folder):
+            if (file_name.startswith(prefix) and file_name.endswith('.pickle') and file_name != current_file
+                    and len(file_name) == len(current_file)):
+                os.remove(os.path.join(self.cache_folder, file_name))
+
+    def required_stages(self, targets, keys):
+        # Walk back from the targets; the inputs of a cached stage are not needed
+        required = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name in required:
+                continue
+            required.add(name)
+            if not self.is_cached(name, keys[name]):
+                pending.extend(self.stages[name].inputs)
+        return required
+
+    def run(self, targets=None):
+        # Returns the results of the target stages (default: stages no other stage uses) and the StageRuns
+        if targets is None:
+            used = {input_name for stage in self.stages.values() for input_name in stage.inputs}
+            targets = [name for name in self.order if name not in used]
+        keys = self.stage_keys()
+        required = self.required_stages(targets, keys)
+
+        results = {}
+        runs = {name: StageRun(name, keys[name], 'skipped', 0.0) for name in self.order}
+        to_run = []
+        for name in self.order:
+            if name not in required:
+                continue
+            if self.is_cached(name, keys[name]):
+                results[name] = self.load_cached(name, keys[name])
+                runs[name].status = 'cached'
+            else:
+                to_run.append(name)
+
+        def ready(main_thread):
+            return [name for name in to_run if self.stages[name].main_thread == main_thread
+                    and all(input_name in results for input_name in self.stages[name].inputs)]
+
+        def finish(name, result, seconds):
+            results[name] = result
+            runs[name].status = 'ran'
+            runs[name].seconds = seconds
+            self.store_cached(name, keys[name], result)
+
+        while to_run:
+            if ready(False):
+                # Run the pool stages until none is ready; leaving the block joins the pool threads
+                with self.executor_class(max_workers=self.max_workers) as executor:
+                    running = {}
+                    while True:
+                        for name in ready(False):
+                            stage = self.stages[name]
+                            future = executor.submit(timed_call, stage.function,
+                                                     [results[input_name] for input_name in stage.inputs], stage.params)
+                            running[future] = name
+                            to_run.remove(name)
+                        if not running:
+                            break
+                        done, pending = wait(running, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            finish(running.pop(future), *future.result())
+            elif ready(True):
+                for name in ready(True):
+                    stage = self.stages[name]
+                    to_run.remove(name)
+                    finish(name, *timed_call(stage.function, [results[input_name] for input_name in stage.inputs],
+                                             stage.params))
+            else:
+                raise ValueError(f"Stages cannot run, inputs missing: {to_run}")
+
+        return {name: results[name] for name in targets}, [runs[name] for name in self.order]
+
+
+def timed_call(function, args, params):
+    # Module level, so it can also be sent to a process pool
+    start_time = time.perf_counter()
+    result = function(*args, **params)
+    return result, time.perf_counter() - start_time
@@ -0,0 +1,221 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from salesDataLoader import load_catalog, encode_categorical_columns
+from salesStore import SalesStore, SALES_STORE_SUFFIX
+
+
+# Synthetic sales data for load testing.
+# Rows are generated in chunks of whole days, each chunk as NumPy arrays (date, product code,
+# region code, quantity), and written straight to CSV, Parquet or a sales store (salesStore.py),
+# so the data set can be far larger than memory. Quantities are drawn around
+#   expected = base quantity * product weight * region weight * trend * weekly season * yearly season
+# either uniformly from 0 to 2 * expected (the default; 0-100 with the defaults, as the original
+# randint(0, 100) demo data) or as Poisson draws (much narrower spread, for load tests).
+# Every day has its own random stream, seeded by the seed and the day's position, so the same
+# seed gives the same rows whatever the chunk size; seed=None draws a fresh seed per generator.
+SYNTHETIC_CHUNK_ROWS = 1000000
+SYNTHETIC_COLUMNS = ['Date', 'Product Name', 'Region', 'Quantity']
+QUANTITY_DISTRIBUTIONS = ('uniform', 'poisson')
+DAYS_PER_YEAR = 365.25
+
+
+class SalesGenerator:
+    def __init__(self, products, regions, start_date, end_date, seed=0, full_grid=True, base_quantity=50.0,
+                 yearly_trend=0.0, weekly_seasonality=0.0, yearly_seasonality=0.0, weight_spread=0.0,
+                 distribution='uniform'):
+        # full_grid: one row per date, product and region; otherwise one row per date and product
+        # in a random region (as dummyDatasetCreation.py generates them)
+        self.products = pa.array([str(product) for product in products], type=pa.string())
+        self.regions = pa.array([str(region) for region in regions], type=pa.string())
+        self.dates = np.arange(np.datetime64(str(start_date), 'D'), np.datetime64(str(end_date), 'D') + 1)
+        self.seed = np.random.SeedSequence().entropy if seed is None else seed
+        self.full_grid = full_grid
+        self.base_quantity = base_quantity
+        self.yearly_trend = yearly_trend
+        self.weekly_seasonality = weekly_seasonality
+        self.yearly_seasonality = yearly_seasonality
+        if distribution not in QUANTITY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown quantity distribution: {distribution}")
+        self.distribution = distribution
+
+        # Fixed popularity of each product and region (1.0 everywhere without a spread)
+        rng = np.random.default_rng([self.seed, 0])
+        self.product_weights = rng.lognormal(0.0, weight_spread, len(self.products))
+        self.region_weights = rng.lognormal(0.0, weight_spread, len(self.regions))
+
+    def rows_per_day(self):
+        return len(self.products) * (len(self.regions) if self.full_grid else 1)
+
+    def row_count(self):
+        return len(self.dates) * self.rows_per_day()
+
+    def day_factors(self, dates):
+        day_numbers = (dates - self.dates[0]).astype('int64')
+        # 1970-01-01 was a Thursday, so (days + 3) % 7 is 0 on Mondays
+        weekdays = (dates.astype('int64') + 3) % 7
+        day_of_year = (dates - dates.astype('datetime64[Y]')).astype('int64')
+        return ((1.0 + self.yearly_trend * day_numbers / DAYS_PER_YEAR)
+                * (1.0 + self.weekly_seasonality * np.sin(2 * np.pi * weekdays / 7))
+                * (1.0 + self.yearly_seasonality * np.sin(2 * np.pi * day_of_year / DAYS_PER_YEAR)))
+
+    def day_rows(self, day_index, day_factor):
+        # Region codes and quantities of one day, from that day's own random stream
+        rng = np.random.default_rng([self.seed, 1, day_index])
+        product_count = len(self.products)
+        region_count = len(self.regions)
+        if self.full_grid:
+            product_codes = np.repeat(np.arange(product_count, dtype='int32'), region_count)
+            region_codes = np.tile(np.arange(region_count, dtype='int32'), product_count)
+        else:
+            product_codes = np.arange(product_count, dtype='int32')
+            region_codes = rng.integers(0, region_count, product_count, dtype='int32')
+
+        expected = np.maximum(self.base_quantity * day_factor * self.product_weights[product_codes]
+                              * self.region_weights[region_codes], 0.0)
+        if self.distribution == 'poisson':
+            quantities = rng.poisson(expected)
+        else:
+            quantities = rng.integers(0, np.round(2 * expected).astype('int64') + 1)
+        return product_codes, region_codes, quantities
+
+    def chunk(self, first_day_index, dates):
+        day_rows = [self.day_rows(first_day_index + offset, day_factor)
+                    for offset, day_factor in enumerate(self.day_factors(dates))]
+        product_codes = np.concatenate([product_codes for product_codes, region_codes, quantities in day_rows])
+        region_codes = np.concatenate([region_codes for product_codes, region_codes, quantities in day_rows])
+        quantities = np.concatenate([quantities for product_codes, region_codes, quantities in day_rows])
+        row_dates = np.repeat(dates, self.rows_per_day())
+
+        return pa.table({
+            'Date': pa.array(row_dates),
+            'Product Name': pa.DictionaryArray.from_arrays(pa.array(product_codes), self.products),
+            'Region': pa.DictionaryArray.from_arrays(pa.array(region_codes), self.regions),
+            'Quantity': pa.array(quantities),
+        })
+
+    def chunks(self, chunk_rows=SYNTHETIC_CHUNK_ROWS):
+        # Whole days per chunk (at least one day, however many rows a day has)
+        days_per_chunk = max(1, chunk_rows // max(1, self.rows_per_day()))
+        for start in range(0, len(self.dates), days_per_chunk):
+            yield self.chunk(start, self.dates[start:start + days_per_chunk])
+
+
+def catalog_generator(start_date, end_date, **options):
+    # Generator over the product and region catalogs in load_dataset
+    return SalesGenerator(load_catalog('Product Name'), load_catalog('Region'), start_date, end_date, **options)
+
+
+def numbered_generator(product_count, region_count, start_date, end_date, **options):
+    # Generator over any number of products and regions ("Product 1", ..., "Region 1", ...)
+    products = [f"Product {number}" for number in range(1, product_count + 1)]
+    regions = [f"Region {number}" for number in range(1, region_count + 1)]
+    return SalesGenerator(products, regions, start_date, end_date, **options)
+
+
+def csv_write_options(generator):
+    # Quotes only where a value needs them, as DataFrame.to_csv wrote the original demo data
+    # (Arrow's 'needed' style quotes every string)
+    names = generator.products.to_pylist() + generator.regions.to_pylist()
+    needs_quotes = any(character in name for name in names for character in ',"\r\n')
+    return pa_csv.WriteOptions(quoting_style='needed' if needs_quotes else 'none', quoting_header='none')
+
+
+def write_sales_csv(generator, file_path, chunk_rows=SYNTHETIC_CHUNK_ROWS):
+    row_count = 0
+    writer = None
+    temp_file_path = file_path + '.tmp'
+    try:
+        for table in generator.chunks(chunk_rows):
+            # CSV columns are plain text; the dictionary columns are written as their values
+            table = table.cast(pa.schema([('Date', pa.date32()), ('Product Name', pa.string()),
+                                          ('Region', pa.string()), ('Quantity', pa.int64())]))
+            if writer is None:
+                writer = pa_csv.CSVWriter(temp_file_path, table.schema, write_options=csv_write_options(generator))
+            writer.write_table(table)
+            row_count += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        os.replace(temp_file_path, file_path)
+    return row_count
+
+
+def write_sales_parquet(generator, file_path, chunk_rows=SYNTHETIC_CHUNK_ROWS):
+    # One row group per chunk; product and region stay dictionary encoded and dates are
+    # timestamps, so the file reads back with the dtypes load_sales_data gives
+    row_count = 0
+    writer = None
+    temp_file_path = file_path + '.tmp'
+    try:
+        for table in generator.chunks(chunk_rows):
+            table = table.cast(pa.schema([('Date', pa.timestamp('us')), table.schema.field('Product Name'),
+                                          table.schema.field('Region'), ('Quantity', pa.int64())]))
+            if writer is None:
+                writer = pq.ParquetWriter(temp_file_path, table.schema)
+            writer.write_table(table)
+            row_count += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        os.replace(temp_file_path, file_path)
+    return row_count
+
+
+def write_sales_store(generator, store_path, chunk_rows=SYNTHETIC_CHUNK_ROWS):
+    # Appended to the store (a new store is created if there is none)
+    sales_store = SalesStore(store_path)
+    row_count = 0
+    for table in generator.chunks(chunk_rows):
+        row_count += sales_store.append_frame(table.to_pandas())
+    return row_count
+
+
+def write_sales_file(generator, file_path, chunk_rows=SYNTHETIC_CHUNK_ROWS):
+    if file_path.lower().rstrip('/').endswith(SALES_STORE_SUFFIX):
+        return write_sales_store(generator, file_path, chunk_rows)
+    if file_path.lower().endswith('.parquet'):
+        return write_sales_parquet(generator, file_path, chunk_rows)
+    return write_sales_csv(generator, file_path, chunk_rows)
+
+
+def sales_frame(generator):
+    # The whole data set as one DataFrame, typed as load_sales_data returns it (small scales only)
+    sales_data = pa.concat_tables(generator.chunks()).to_pandas()
+    sales_data['Date'] = sales_data['Date'].astype('datetime64[us]')
+    return encode_categorical_columns(sales_data[SYNTHETIC_COLUMNS])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write synthetic sales data for load testing')
+    parser.add_argument('file_path', help='output .csv or .parquet file, or a .salesstore folder to append to')
+    parser.add_argument('--products', type=int, help='number of products (default: the product catalog)')
+    parser.add_argument('--regions', type=int, help='number of regions (default: the region catalog)')
+    parser.add_argument('--start-date', default='2023-01-01')
+    parser.add_argument('--end-date', default=str(pd.Timestamp.today().date()))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--random-region', action='store_true', help='one random region per product and day')
+    parser.add_argument('--yearly-trend', type=float, default=0.0)
+    parser.add_argument('--weekly-seasonality', type=float, default=0.0)
+    parser.add_argument('--yearly-seasonality', type=float, default=0.0)
+    parser.add_argument('--distribution', choices=QUANTITY_DISTRIBUTIONS, default='uniform')
+    parser.add_argument('--chunk-rows', type=int, default=SYNTHETIC_CHUNK_ROWS)
+    arguments = parser.parse_args()
+
+    options = {'seed': arguments.seed, 'full_grid': not arguments.random_region, 'yearly_trend': arguments.yearly_trend,
+               'weekly_seasonality': arguments.weekly_seasonality, 'yearly_seasonality': arguments.yearly_seasonality,
+               'distribution': arguments.distribution}
+    if arguments.products is None and arguments.regions is None:
+        sales_generator = catalog_generator(arguments.start_date, arguments.end_date, **options)
+    else:
+        sales_generator = numbered_generator(arguments.products or len(load_catalog('Product Name')),
+                                             arguments.regions or len(load_catalog('Region')),
+                                             arguments.start_date, arguments.end_date, **options)
+    rows = write_sales_file(sales_generator, arguments.file_path, arguments.chunk_rows)
+    print(f"Wrote {rows} rows of synthetic sales data to {arguments.file_path}")
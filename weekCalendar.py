@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+
+# Year-aware ISO week keys.
+# A week is identified by its ISO year and ISO week number, combined into one sortable integer
+# key (e.g. 202324 for week 24 of 2023), so weeks from different years never collide and
+# "last N weeks" lookups are binary searches over a sorted key column.
+FIRST_MONDAY = np.datetime64('1970-01-05')
+ONE_WEEK = np.timedelta64(7, 'D')
+
+
+def add_week_keys(frame, date_column='Date'):
+    iso_calendar = frame[date_column].dt.isocalendar()
+    frame['Year'] = iso_calendar['year'].astype('int64')
+    frame['Week'] = iso_calendar['week'].astype('int64')
+    frame['Week Key'] = frame['Year'] * 100 + frame['Week']
+    return frame
+
+
+def split_week_keys(week_keys):
+    week_keys = np.asarray(week_keys, dtype='int64')
+    return week_keys // 100, week_keys % 100
+
+
+def week_key_to_monday(week_keys):
+    years, weeks = split_week_keys(week_keys)
+    # ISO week 1 is the week containing January 4th
+    january_fourth = pd.to_datetime(years * 10000 + 104, format='%Y%m%d')
+    first_monday = january_fourth - pd.to_timedelta(january_fourth.weekday, unit='D')
+    return (first_monday + pd.to_timedelta((weeks - 1) * 7, unit='D')).values.astype('datetime64[D]')
+
+
+def week_key_to_ordinal(week_keys):
+    # Consecutive integers for consecutive weeks, across year boundaries
+    return (week_key_to_monday(week_keys) - FIRST_MONDAY) // ONE_WEEK
+
+
+def ordinal_to_week_key(ordinals):
+    mondays = FIRST_MONDAY + np.asarray(ordinals, dtype='int64') * ONE_WEEK
+    iso_calendar = pd.DatetimeIndex(mondays).isocalendar()
+    return iso_calendar['year'].to_numpy(dtype='int64') * 100 + iso_calendar['week'].to_numpy(dtype='int64')
+
+
+def slice_weeks(frame, first_week_key, last_week_key=None, key_column='Week Key'):
+    # The frame must be sorted by key_column; the slice is found by binary search
+    week_keys = frame[key_column].to_numpy()
+    start = np.searchsorted(week_keys, first_week_key, side='left')
+    end = len(week_keys) if last_week_key is None else np.searchsorted(week_keys, last_week_key, side='right')
+    return frame.iloc[start:end]
+
+
+class WeekCalendar:
+    def __init__(self, week_keys):
+        self.week_keys = np.unique(np.asarray(week_keys, dtype='int64'))
+
+    def __len__(self):
+        return len(self.week_keys)
+
+    def last_weeks(self, count):
+        if count <= 0:
+            return self.week_keys[:0]
+        return self.week_keys[-count:]
+